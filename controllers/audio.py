@@ -1,43 +1,202 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
-from db.postgres_management import PostgresManagement
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from db.postgres_management import get_db
 from models.audio import Audio
-from schemas.audio import AudioUploadSchema
-import uuid
+from schemas.audio import AudioUploadSchema, AudioRegisterSchema
+import os
+from datetime import date
+from typing import Optional
 from controllers.auth_middleware import *
-from utils.azure_blob import BlobStorage
+from utils.storage import Storage, get_storage, get_async_storage, user_blob_name, user_blob_prefix, original_filename
+from utils.blob_response import stream_blob
+from utils.purge import purge_audio_files
 
 router = APIRouter()
-db = PostgresManagement(
-        user="admin_railway",
-        password="Welcome@3210",
-        host="caasrailwat.postgres.database.azure.com",
-        database="railwayproject",
-        port=5432
-    )
-blob = BlobStorage()
+db = get_db()
+blob = get_storage()
+# Used by the async endpoints so transfers don't block the event loop
+async_blob = get_async_storage()
 
 AUDIO_CONTAINER = "audiofiles"
 TRANSCRIPT_CONTAINER = "transcripts"
 
+# Minutes a direct-upload URL stays valid
+AUDIO_UPLOAD_URL_MINUTES = int(os.getenv("AUDIO_UPLOAD_URL_MINUTES", "15"))
+# Bytes read from the start of a directly uploaded blob to probe its duration
+AUDIO_PROBE_HEADER_BYTES = int(os.getenv("AUDIO_PROBE_HEADER_BYTES", str(64 * 1024)))
+
+# Audio duration is probed at upload so transcription jobs can be scheduled shortest-first
+db.add_column_if_missing("audio_files", "duration_seconds", "DOUBLE PRECISION")
+
+
+@router.on_event("shutdown")
+async def close_async_blob():
+    await async_blob.close()
+
+
+async def insert_audio_record(audio_record):
+    """
+    Inserts an `audio_files` row and returns its id.
+    """
+    return await run_in_threadpool(db.insert_record_id, "audio_files", audio_record.__dict__)
+
+
+async def probe_blob_duration(blob_name, properties):
+    """
+    Probes the duration of an uploaded audio blob from a ranged read of its header, so scheduling
+    never relies on a duration reported by the client. Returns None if it can't be probed that way.
+    """
+    from utils.audio_processing import probe_header_duration
+
+    if not properties.size:
+        return None
+    header = b"".join([chunk async for chunk in async_blob.iter_chunks(
+        blob_name, AUDIO_CONTAINER, offset=0, length=min(properties.size, AUDIO_PROBE_HEADER_BYTES), etag=properties.etag
+    )])
+    return await run_in_threadpool(probe_header_duration, header, properties.size)
+
+
 @router.post("/upload_audio")
 async def upload_audio(file: UploadFile = File(...), data: AudioUploadSchema = Depends(), current_user: str = Depends(get_current_user)):
     """
     Upload an audio file and store metadata in PostgreSQL.
     """
     try:
-        blob_url = blob.upload_file(file.filename, file.file, container_name=AUDIO_CONTAINER, content_type=file.content_type)
+        from utils.audio_processing import probe_duration
+
+        # Compressed formats are probed by decoding the whole file: keep that off the event loop
+        duration_seconds = await run_in_threadpool(probe_duration, file.file)
+        blob_url = await async_blob.upload_file(user_blob_name(data.user_id, file.filename), file.file,
+                                                container_name=AUDIO_CONTAINER, content_type=file.content_type)
         audio_record = Audio(
             id=None,
             user_id=data.user_id,
             filename=file.filename,
             blob_url=blob_url,
             status="uploaded",
-            uploaded_at="NOW()"
+            uploaded_at="NOW()",
+            duration_seconds=duration_seconds
         )
 
-        audio_id = db.insert_record("audio_files", audio_record.__dict__)["id"]
+        audio_id = await insert_audio_record(audio_record)
 
         return {"status": True, "message": "Audio uploaded successfully", "audio_id": audio_id}
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+@router.post("/request_audio_upload")
+async def request_audio_upload(data: AudioUploadSchema = Depends(), current_user: str = Depends(get_current_user)):
+    """
+    Step 1 of a direct upload: issues a short-lived, write-only URL for a new blob.
+    The client PUTs the file to `upload_url` (with the returned headers) straight to storage,
+    then calls /register_audio_upload. The audio never passes through the API.
+    """
+    try:
+        blob_name = user_blob_name(data.user_id, data.filename)
+        upload_url = await async_blob.generate_upload_url(blob_name, AUDIO_CONTAINER, AUDIO_UPLOAD_URL_MINUTES)
+
+        return {
+            "status": True,
+            "blob_name": blob_name,
+            "upload_url": upload_url,
+            "headers": {"x-ms-blob-type": "BlockBlob", "x-ms-blob-content-type": data.content_type},
+            "expires_in_minutes": AUDIO_UPLOAD_URL_MINUTES
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to issue upload URL: {str(e)}")
+
+
+@router.post("/register_audio_upload")
+async def register_audio_upload(data: AudioRegisterSchema = Depends(), current_user: str = Depends(get_current_user)):
+    """
+    Step 2 of a direct upload: records a blob uploaded through /request_audio_upload in `audio_files`.
+    """
+    if not data.blob_name.startswith(user_blob_prefix(data.user_id)):
+        raise HTTPException(status_code=403, detail="Blob was not issued for this user.")
+
+    try:
+        properties = await async_blob.get_properties(data.blob_name, AUDIO_CONTAINER)
+        if properties is None:
+            raise HTTPException(status_code=404, detail="Uploaded blob not found. Upload the file before registering it.")
+
+        audio_record = Audio(
+            id=None,
+            user_id=data.user_id,
+            filename=data.filename,
+            blob_url=async_blob.blob_url(data.blob_name, AUDIO_CONTAINER),
+            status="uploaded",
+            uploaded_at="NOW()",
+            duration_seconds=await probe_blob_duration(data.blob_name, properties)
+        )
+
+        audio_id = await insert_audio_record(audio_record)
+
+        return {"status": True, "message": "Audio registered successfully", "audio_id": audio_id, "size": properties.size}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
+
+
+@router.get("/stream_audio/{audio_id}")
+async def stream_audio(audio_id: int, request: Request, current_user: str = Depends(get_current_user)):
+    """
+    Streams an uploaded audio file, with HTTP Range (seeking) and ETag / If-None-Match support.
+    """
+    audio_file = await run_in_threadpool(db.find_record, "audio_files", "id=%s", (audio_id,))
+    if not audio_file:
+        raise HTTPException(status_code=404, detail="Audio file not found.")
+
+    try:
+        return await stream_blob(request, async_blob, Storage.blob_name_from_url(audio_file["blob_url"]), AUDIO_CONTAINER)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to stream audio: {str(e)}")
+
+
+@router.get("/audio_files/{user_id}")
+async def list_audio_files(user_id: int, day: Optional[date] = None, current_user: str = Depends(get_current_user)):
+    """
+    Lists a user's uploaded audio (optionally only that of one day, `?day=YYYY-MM-DD`) with a
+    single prefix listing of the storage container.
+    """
+    try:
+        files = await async_blob.list_files(user_blob_prefix(user_id, day), AUDIO_CONTAINER)
+        return {"status": True, "data": [{
+            "blob_name": properties.name,
+            "filename": original_filename(properties.name),
+            "size": properties.size,
+            "last_modified": properties.last_modified,
+            "blob_url": async_blob.blob_url(properties.name, AUDIO_CONTAINER)
+        } for properties in files]}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to list audio files: {str(e)}")
+
+
+@router.delete("/audio/{audio_id}")
+def delete_audio(audio_id: int, current_user: str = Depends(get_current_user)):
+    """
+    Deletes an audio file with its stored segments, its transcripts and their jobs.
+    """
+    audio_file = db.find_record("audio_files", "id=%s", (audio_id,))
+    if not audio_file:
+        raise HTTPException(status_code=404, detail="Audio file not found.")
+
+    try:
+        deleted = purge_audio_files(db, blob, [audio_file])
+        return {"status": True, "message": "Audio deleted successfully", "data": deleted}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Deletion failed: {str(e)}")
+
+
+@router.get("/upload_metrics")
+def upload_metrics(current_user: str = Depends(get_current_user)):
+    """
+    Throughput and time to first byte of the recent blob uploads of this API process.
+    """
+    return {"status": True, "data": {"sync": blob.upload_stats(), "async": async_blob.upload_stats()}}
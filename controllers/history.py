@@ -1,17 +1,11 @@
 from fastapi import APIRouter, HTTPException, Depends
-from db.postgres_management import PostgresManagement
+from db.postgres_management import get_db
 from models.history import History
 from schemas.history import HistorySchema
 from controllers.auth_middleware import *
 
 router = APIRouter()
-db = PostgresManagement(
-        user="admin_railway",
-        password="Welcome@3210",
-        host="caasrailwat.postgres.database.azure.com",
-        database="railwayproject",
-        port=5432
-    )
+db = get_db()
 
 @router.get("/transcription_history")
 def get_transcription_history(data: HistorySchema = Depends(), current_user: str = Depends(get_current_user)):
@@ -1,18 +1,28 @@
-from fastapi import APIRouter, HTTPException, Depends
-from db.postgres_management import PostgresManagement
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from db.postgres_management import get_db
 from models.transcript import Transcript
 from schemas.transcript import TranscriptSchema
-from utils.celery_worker import process_transcription_job
+import csv
+import io
+from utils.celery_worker import submit_transcription_job, process_transcription_job
+from utils.storage import get_storage, get_async_storage
+from utils.blob_response import stream_blob
+from utils.transcript_writer import partial_transcript_filename, TRANSCRIPT_FORMATS
 from controllers.auth_middleware import *
 
 router = APIRouter()
-db = PostgresManagement(
-        user="admin_railway",
-        password="Welcome@3210",
-        host="caasrailwat.postgres.database.azure.com",
-        database="railwayproject",
-        port=5432
-    )
+db = get_db()
+blob = get_storage()
+async_blob = get_async_storage()
+
+TRANSCRIPT_CONTAINER = "transcripts"
+
+
+@router.on_event("shutdown")
+async def close_async_blob():
+    await async_blob.close()
+
 
 @router.post("/create_transcription_job")
 def create_transcription_job(data: TranscriptSchema = Depends(), current_user: str = Depends(get_current_user)):
@@ -22,6 +32,8 @@ def create_transcription_job(data: TranscriptSchema = Depends(), current_user: s
     """
     if data.interval not in ["1min", "5min"]:
         raise HTTPException(status_code=400, detail="Invalid interval. Choose '1min' or '5min'.")
+    if data.format not in TRANSCRIPT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Choose one of {', '.join(TRANSCRIPT_FORMATS)}.")
 
     try:
         transcript_record = Transcript(
@@ -35,10 +47,12 @@ def create_transcription_job(data: TranscriptSchema = Depends(), current_user: s
             updated_at="NOW()"
         )
 
-        job_id = db.insert_record("transcription_jobs", transcript_record.__dict__)["id"]
-        audio_blob_url = db.find_record("audio_files", "id=%s", (data.audio_id,))["blob_url"]
-        
-        process_transcription_job.delay(job_id, audio_blob_url, data.interval)
+        job_id = db.insert_record_id("transcription_jobs", transcript_record.__dict__)
+        audio_file = db.find_record("audio_files", "id=%s", (data.audio_id,))
+
+        # Re-runs for an already transcribed audio file are served from its stored segments
+        submit_transcription_job(job_id, audio_file["blob_url"], data.interval, data.include_speaker,
+                                 duration=audio_file.get("duration_seconds"), transcript_format=data.format)
 
         return {"job_id": job_id, "message": f"Transcription job started for {data.interval} interval."}
 
@@ -46,6 +60,33 @@ def create_transcription_job(data: TranscriptSchema = Depends(), current_user: s
         raise HTTPException(status_code=500, detail=f"Failed to create transcript job: {str(e)}")
 
 
+@router.post("/retry_transcription_job/{job_id}")
+def retry_transcription_job(job_id: int, current_user: str = Depends(get_current_user)):
+    """
+    Re-runs a failed or stuck transcription job.
+    Processing resumes after the last checkpointed stage instead of starting over.
+    """
+    try:
+        job = db.find_record("transcription_jobs", "id=%s", (job_id,))
+
+        if not job:
+            raise HTTPException(status_code=404, detail="Transcription job not found.")
+        if job["job_status"] == "completed":
+            return {"status": False, "message": "Transcription job already completed."}
+
+        checkpoint = job.get("checkpoint") or {}
+        audio_blob_url = db.find_record("audio_files", "id=%s", (job["audio_file_id"],))["blob_url"]
+        process_transcription_job.delay(job_id, audio_blob_url, job["interval"], checkpoint.get("include_speaker", False),
+                                        checkpoint.get("format", "csv"))
+
+        return {"status": True, "job_id": job_id, "message": f"Transcription job resumed after stage '{job.get('last_stage')}'."}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retry transcript job: {str(e)}")
+
+
 @router.get("/get_transcript/{job_id}")
 def get_transcript(job_id: int, current_user: str = Depends(get_current_user)):
     """
@@ -66,8 +107,60 @@ def get_transcript(job_id: int, current_user: str = Depends(get_current_user)):
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve transcript: {str(e)}")
+
+
+
+@router.get("/stream_transcript/{job_id}")
+async def stream_transcript(job_id: int, request: Request, current_user: str = Depends(get_current_user)):
+    """
+    Streams the completed transcript of a job, with HTTP Range and ETag / If-None-Match support.
+    """
+    transcript = await run_in_threadpool(db.find_record, "transcription_jobs", "id=%s AND job_status=%s", (job_id, "completed"))
+    if not transcript:
+        raise HTTPException(status_code=404, detail="Transcript not available yet.")
+
+    try:
+        return await stream_blob(request, async_blob, transcript["transcript_filename"], TRANSCRIPT_CONTAINER,
+                                 download_name=transcript["transcript_filename"])
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to stream transcript: {str(e)}")
     
 
+@router.get("/get_partial_transcript/{job_id}")
+def get_partial_transcript(job_id: int, current_user: str = Depends(get_current_user)):
+    """
+    Returns the transcript rows available so far for a job still being processed,
+    together with its progress (fraction of the audio transcribed).
+    Partial rows have no speaker column; the final transcript is served by /get_transcript.
+    """
+    try:
+        job = db.find_record("transcription_jobs", "id=%s", (job_id,))
+
+        if not job:
+            raise HTTPException(status_code=404, detail="Transcription job not found.")
+
+        try:
+            reader = csv.reader(io.StringIO(blob.download_file(partial_transcript_filename(job_id), TRANSCRIPT_CONTAINER).decode("utf-8")))
+            header, rows = next(reader, []), list(reader)
+        except FileNotFoundError:
+            header, rows = [], []
+
+        return {
+            "status": True,
+            "job_status": job["job_status"],
+            "progress": job.get("progress") or 0,
+            "header": header,
+            "rows": rows
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve partial transcript: {str(e)}")
+
+
 # @router.get("/transcription_history/{user_id}")
 # def get_transcription_history(user_id: int, date: str):
 #     """
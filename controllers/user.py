@@ -5,16 +5,10 @@ from fastapi import APIRouter
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from typing import Optional
 from models.user import User
-from db.postgres_management import PostgresManagement  # Your MySQL management class
+from db.postgres_management import get_db  # Your MySQL management class
 
 app = APIRouter()
-mysql_client = PostgresManagement(
-        user="admin_railway",
-        password="Welcome@3210",
-        host="caasrailwat.postgres.database.azure.com",
-        database="railwayproject",
-        port=5432
-    )
+mysql_client = get_db()
 table_name = "users_table"
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
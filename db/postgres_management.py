@@ -1,37 +1,142 @@
+import os
+import time
+import threading
 import psycopg2
 from psycopg2 import pool
+from psycopg2 import extensions
 import pandas as pd
 import uuid
+from dotenv import load_dotenv
+
+
+# Load environment variables
+load_dotenv()
+
+# Connection settings of the process-wide pool (see `get_db`)
+POSTGRES_USER = os.getenv("POSTGRES_USER", "admin_railway")
+POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "Welcome@3210")
+POSTGRES_HOST = os.getenv("POSTGRES_HOST", "caasrailwat.postgres.database.azure.com")
+POSTGRES_DATABASE = os.getenv("POSTGRES_DATABASE", "railwayproject")
+POSTGRES_PORT = int(os.getenv("POSTGRES_PORT", "5432"))
+
+# Connections per process (opened at start / at most), and seconds a caller waits for a free
+# connection before giving up
+POSTGRES_POOL_MIN = int(os.getenv("POSTGRES_POOL_MIN", "1"))
+POSTGRES_POOL_MAX = int(os.getenv("POSTGRES_POOL_MAX", "10"))
+POSTGRES_POOL_TIMEOUT = float(os.getenv("POSTGRES_POOL_TIMEOUT", "30"))
 
 
 class PostgresManagement:
-    def __init__(self, user, password, host, database, port=5432):
+    def __init__(self, user, password, host, database, port=5432, minconn=POSTGRES_POOL_MIN,
+                 maxconn=POSTGRES_POOL_MAX, timeout=POSTGRES_POOL_TIMEOUT):
         """
         Initializes Azure PostgreSQL connection pool using `psycopg2`.
+
+        The pool is thread-safe and bounded: at most `maxconn` connections are checked out at
+        once, and `get_connection` waits up to `timeout` seconds for one to be released instead
+        of failing right away. Use `get_db()` to share one pool across the whole process.
         """
+        self._settings = {"user": user, "password": password, "host": host, "port": port, "database": database}
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        # Pools inherited from a parent process, see `_check_fork`
+        self._inherited_pools = []
         try:
-            self.pool = psycopg2.pool.SimpleConnectionPool(
-                minconn=1,
-                maxconn=10,
-                user=user,
-                password=password,
-                host=host,
-                port=port,
-                database=database
-            )
-            if not self.pool:
-                raise Exception("Failed to create PostgreSQL connection pool.")
-
+            self._create_pool()
         except Exception as e:
             raise Exception(f"(__init__): Failed to initialize PostgreSQL pool\n{str(e)}")
 
+    def _create_pool(self):
+        self.pool = psycopg2.pool.ThreadedConnectionPool(minconn=self.minconn, maxconn=self.maxconn, **self._settings)
+        if not self.pool:
+            raise Exception("Failed to create PostgreSQL connection pool.")
+        # Caps checked-out connections, so the pool itself never raises PoolError when exhausted
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._stats = {"acquired": 0, "timeouts": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0,
+                       "in_use": 0, "peak_in_use": 0, "waiting": 0}
+        self._pid = os.getpid()
+
+    def _check_fork(self):
+        """
+        Re-creates the pool in a forked child (e.g. a Celery prefork worker): connections
+        inherited from the parent must not be shared between processes.
+
+        The inherited pool is deliberately kept alive and never used: once garbage-collected,
+        psycopg2 would close its connections, sending Terminate over the sockets the child shares
+        with the parent and ending the parent's server sessions.
+        """
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._inherited_pools.append(self.pool)
+                    self._create_pool()
+
     def get_connection(self):
-        """Gets a connection from the pool."""
-        return self.pool.getconn()
+        """Gets a connection from the pool, waiting up to `timeout` seconds for a free one."""
+        self._check_fork()
+        started = time.perf_counter()
+        with self._lock:
+            self._stats["waiting"] += 1
+        acquired = self._slots.acquire(timeout=self.timeout)
+        waited = time.perf_counter() - started
+
+        with self._lock:
+            stats = self._stats
+            stats["waiting"] -= 1
+            if acquired:
+                stats["acquired"] += 1
+                stats["wait_seconds"] += waited
+                stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+                stats["in_use"] += 1
+                stats["peak_in_use"] = max(stats["peak_in_use"], stats["in_use"])
+            else:
+                stats["timeouts"] += 1
+        if not acquired:
+            raise Exception(f"(get_connection): No database connection free after {self.timeout}s "
+                            f"(all {self.maxconn} in use)")
+
+        try:
+            return self.pool.getconn()
+        except Exception:
+            self._release_slot()
+            raise
 
     def release_connection(self, conn):
         """Releases the connection back to the pool."""
-        self.pool.putconn(conn)
+        try:
+            # A failed statement leaves the transaction aborted for the next user of the connection
+            if not conn.closed and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except Exception:
+            pass
+        try:
+            self.pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self._release_slot()
+
+    def _release_slot(self):
+        with self._lock:
+            self._stats["in_use"] -= 1
+        self._slots.release()
+
+    def pool_stats(self):
+        """
+        Usage of the pool in this process: connections in use (now / peak) and waiting
+        callers, plus the number of checkouts, their mean / max wait and timeouts.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        acquired = stats.pop("acquired")
+        wait_seconds = stats.pop("wait_seconds")
+        return {
+            "max_connections": self.maxconn,
+            "checkouts": acquired,
+            "mean_wait_ms": round(wait_seconds / acquired * 1000, 2) if acquired else None,
+            "max_wait_ms": round(stats.pop("max_wait_seconds") * 1000, 2),
+            **stats
+        }
 
     def close_pool(self):
         """Closes all connections in the pool."""
@@ -64,6 +169,18 @@ class PostgresManagement:
         finally:
             self.release_connection(conn)
 
+    def add_column_if_missing(self, table_name, column_name, definition):
+        """Adds a column to an existing table unless it is already present."""
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS {column_name} {definition};")
+                conn.commit()
+        except Exception as e:
+            raise Exception(f"(add_column_if_missing): Failed to add column '{column_name}' to '{table_name}'\n{str(e)}")
+        finally:
+            self.release_connection(conn)
+
     def insert_record(self, table_name, record):
         """
         Inserts a single record into the specified table.
@@ -100,6 +217,17 @@ class PostgresManagement:
         finally:
             self.release_connection(conn)
 
+    def insert_record_id(self, table_name, record):
+        """
+        Inserts a single record (see `insert_record`) and returns the id of the new row.
+        Raises if the insert fails.
+        """
+        result = self.insert_record(table_name, record)
+        if not result["status"]:
+            raise Exception(f"(insert_record_id): Failed inserting into '{table_name}'\n{result['message']}")
+        # `id` is the first column of every table, so it leads the RETURNING * row
+        return result["data"][0]
+
     def find_record(self, table_name, condition, params):
         """
         Retrieves the first record that matches the condition.
@@ -291,4 +419,21 @@ class PostgresManagement:
         except Exception as e:
             raise Exception(f"(get_result_to_display_on_browser): Something went wrong with '{table_name}'\n{str(e)}")
         finally:
-            self.release_connection(conn)
\ No newline at end of file
+            self.release_connection(conn)
+
+
+_db = None
+_db_lock = threading.Lock()
+
+
+def get_db() -> PostgresManagement:
+    """
+    Returns the process-wide PostgresManagement, created on first use. All modules share its
+    pool (POSTGRES_POOL_MAX connections per process).
+    """
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                _db = PostgresManagement(POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_HOST, POSTGRES_DATABASE, POSTGRES_PORT)
+    return _db
@@ -1,8 +1,10 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Depends
 from controllers.user import app
 from controllers.audio import  router as audio
 from controllers.history import router as history
 from controllers.transcript import router as transcript
+from controllers.auth_middleware import get_current_user
+from db.postgres_management import get_db
 
 route = FastAPI(debug=True)
 
@@ -12,3 +14,10 @@ route.include_router(audio)
 route.include_router(history)
 route.include_router(transcript)
 
+
+@route.get("/db_pool_stats")
+def db_pool_stats(current_user: str = Depends(get_current_user)):
+    """
+    Usage of the shared PostgreSQL connection pool of this API process.
+    """
+    return {"status": True, "data": get_db().pool_stats()}
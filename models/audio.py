@@ -2,10 +2,11 @@ class Audio:
     """
     Model for storing uploaded audio files in PostgreSQL.
     """
-    def __init__(self, id, user_id, filename, blob_url, status, uploaded_at):
+    def __init__(self, id, user_id, filename, blob_url, status, uploaded_at, duration_seconds=None):
         self.id = id
         self.user_id = user_id
         self.filename = filename
         self.blob_url = blob_url
         self.status = status
-        self.uploaded_at = uploaded_at
\ No newline at end of file
+        self.uploaded_at = uploaded_at
+        self.duration_seconds = duration_seconds
\ No newline at end of file
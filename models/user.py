@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
 import pymysql
-from db.postgres_management import PostgresManagement  # Your MySQL management class
+from db.postgres_management import get_db  # Your MySQL management class
+from utils.storage import get_storage
+from utils.purge import purge_audio_files
 from werkzeug.security import generate_password_hash, check_password_hash
 import uuid
 import jwt
@@ -10,15 +12,10 @@ SECRET_KEY = os.getenv("SECRET_KEY", "default_key_if_not_set")
 ALGORITHM = "HS256"
 
 # Initialize MySQL Client
-mysql_client =  PostgresManagement(
-        user="admin_railway",
-        password="Welcome@3210",
-        host="caasrailwat.postgres.database.azure.com",
-        database="railwayproject",
-        port=5432
-    )
+mysql_client = get_db()
 
 table_name = "users_table"
+blob = get_storage()
 
 class User:
     """User Model for MySQL"""
@@ -114,9 +111,11 @@ class User:
             raise Exception(f"(update_signup_user): Failed updating user\n{str(e)}")
 
     def delete(self, user_uuid):
-        """Delete a user"""
+        """Delete a user with their audio files and transcripts"""
         user = self.get_by_id(user_uuid)
         if user:
+            audio_files = mysql_client.find_all_records("audio_files", "user_id=%s", (user["id"],))
+            purge_audio_files(mysql_client, blob, audio_files)
             mysql_client.delete_record(table_name, "user_uuid=%s", (user_uuid,))
             return {"status": True, "message": "User deleted"}
         return {"status": False, "message": "User not found"}
@@ -4,4 +4,9 @@ from pydantic import BaseModel
 class AudioUploadSchema(BaseModel):
     user_id: int
     filename: str
-    content_type: str
\ No newline at end of file
+    content_type: str
+
+class AudioRegisterSchema(BaseModel):
+    user_id: int
+    blob_name: str
+    filename: str
@@ -3,4 +3,6 @@ from pydantic import BaseModel
 class TranscriptSchema(BaseModel):
     audio_id: str
     interval: str
+    include_speaker: bool = False
+    format: str = "csv"  # csv, jsonl or parquet
 
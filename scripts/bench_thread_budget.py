@@ -0,0 +1,86 @@
+# Benchmark: aggregate CPU throughput of N worker processes with and without a thread budget
+#
+#   python scripts/bench_thread_budget.py --processes 1 2 4 8 --seconds 10
+#
+# Each process runs a preprocessing/ASR-like workload (BLAS matmul + FFT, and a torch matmul
+# when torch is installed) in a loop. "default" lets every library size its pools to all cores,
+# as the Celery workers did before; "budget" applies utils/thread_budget.py with cores // N threads.
+import os
+import sys
+import time
+import argparse
+import multiprocessing as mp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.thread_budget import available_cores, plan_threads, apply_thread_budget
+
+
+def run_workload(threads, seconds, size, start_event, results):
+    if threads:
+        apply_thread_budget(threads)
+
+    # Imported after the budget so the pools start at the budgeted size
+    import numpy as np
+    try:
+        import torch
+    except ImportError:
+        torch = None
+
+    rng = np.random.default_rng(0)
+    a = rng.standard_normal((size, size)).astype(np.float32)
+    signal = rng.standard_normal(16000 * 30).astype(np.float32)
+    t = torch.from_numpy(a) if torch is not None else None
+
+    start_event.wait()
+    items, deadline = 0, time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        a @ a
+        np.fft.rfft(signal.reshape(-1, 400), axis=1)
+        if t is not None:
+            t @ t
+        items += 1
+    results.put(items)
+
+
+def measure(processes, threads, seconds, size):
+    """
+    :return: Work items per second summed over all processes
+    """
+    ctx = mp.get_context("spawn")
+    start_event, results = ctx.Event(), ctx.Queue()
+    workers = [ctx.Process(target=run_workload, args=(threads, seconds, size, start_event, results)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    # Give every process time to import and allocate before the clock starts
+    time.sleep(3)
+    start_event.set()
+    total = sum(results.get() for _ in workers)
+    for worker in workers:
+        worker.join()
+    return total / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thread budget throughput benchmark")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--size", type=int, default=512, help="Matrix size of the matmul workload")
+    args = parser.parse_args()
+
+    # Budgeted runs set these themselves; default runs must not inherit a limit from the shell
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ.pop(var, None)
+
+    cores = available_cores()
+    print(f"{cores} cores available")
+    print(f"{'processes':>9} {'threads':>8} {'default items/s':>16} {'budget items/s':>15} {'speedup':>8}")
+    for processes in args.processes:
+        threads = plan_threads(processes, cores)
+        default = measure(processes, 0, args.seconds, args.size)
+        budget = measure(processes, threads, args.seconds, args.size)
+        print(f"{processes:>9} {threads:>8} {default:>16.1f} {budget:>15.1f} {budget / default if default else 0:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
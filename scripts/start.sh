@@ -8,5 +8,23 @@ source env/bin/activate
 
 # Run Uvicorn server on Azure App Service
 uvicorn main:app --host 0.0.0.0 --port 8000 --reload --workers 1 --timeout-keep-alive 60 --timeout-request 60 &
-# Run Celery worker with Redis as the broker
-celery -A main.celery worker --loglevel=info --concurrency=1 &  
\ No newline at end of file
+
+# Split the cores between the CPU-bound worker processes (fetch/publish are I/O-bound), so torch,
+# BLAS and OpenMP don't each start a pool sized to every core in every process (see utils/thread_budget.py)
+export THREAD_BUDGET_PROCESSES=${THREAD_BUDGET_PROCESSES:-$(( ${PREPROCESS_CONCURRENCY:-2} + ${TRANSCRIBE_CONCURRENCY:-1} + ${DIARIZE_CONCURRENCY:-1} + ${RENDER_CONCURRENCY:-2} ))}
+
+# Run one Celery worker per transcription stage queue, each with its own concurrency. Each CPU-bound
+# worker's THREAD_BUDGET_SLOT_OFFSET is the total concurrency of the workers before it, so with
+# THREAD_BUDGET_PIN=true their processes get disjoint cores; the I/O-bound fetch worker isn't pinned
+PREPROCESS_OFFSET=0
+TRANSCRIBE_OFFSET=$(( PREPROCESS_OFFSET + ${PREPROCESS_CONCURRENCY:-2} ))
+DIARIZE_OFFSET=$(( TRANSCRIBE_OFFSET + ${TRANSCRIBE_CONCURRENCY:-1} ))
+RENDER_OFFSET=$(( DIARIZE_OFFSET + ${DIARIZE_CONCURRENCY:-1} ))
+THREAD_BUDGET_PIN=false celery -A utils.celery_worker.celery_app worker --loglevel=info -Q transcription.fetch,transcription.publish -n fetch@%h --concurrency=${FETCH_CONCURRENCY:-4} -O fair &
+THREAD_BUDGET_SLOT_OFFSET=$PREPROCESS_OFFSET celery -A utils.celery_worker.celery_app worker --loglevel=info -Q transcription.preprocess -n preprocess@%h --concurrency=${PREPROCESS_CONCURRENCY:-2} -O fair &
+THREAD_BUDGET_SLOT_OFFSET=$TRANSCRIBE_OFFSET celery -A utils.celery_worker.celery_app worker --loglevel=info -Q transcription.transcribe -n transcribe@%h --concurrency=${TRANSCRIBE_CONCURRENCY:-1} -O fair &
+THREAD_BUDGET_SLOT_OFFSET=$DIARIZE_OFFSET celery -A utils.celery_worker.celery_app worker --loglevel=info -Q transcription.diarize -n diarize@%h --concurrency=${DIARIZE_CONCURRENCY:-1} -O fair &
+THREAD_BUDGET_SLOT_OFFSET=$RENDER_OFFSET celery -A utils.celery_worker.celery_app worker --loglevel=info -Q transcription.render -n render@%h --concurrency=${RENDER_CONCURRENCY:-2} -O fair &
+
+# Optional pipelined transcription worker (set TRANSCRIPTION_PIPELINE=true for the API as well)
+# python -m utils.celery_worker &
@@ -0,0 +1,167 @@
+# Integration tests of AsyncBlobStorage against a local Azurite blob emulator
+# (e.g. `docker run -p 10000:10000 mcr.microsoft.com/azure-storage/azurite azurite-blob --blobHost 0.0.0.0`).
+# Skipped when the emulator isn't reachable; set AZURITE_CONNECTION_STRING to use another endpoint.
+import os
+import gzip
+import uuid
+import socket
+import asyncio
+from urllib.parse import urlparse
+import pytest
+
+
+AZURITE_CONNECTION_STRING = os.getenv(
+    "AZURITE_CONNECTION_STRING",
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+    "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;"
+)
+
+
+def _azurite_reachable():
+    settings = dict(part.split("=", 1) for part in AZURITE_CONNECTION_STRING.split(";") if "=" in part)
+    endpoint = urlparse(settings.get("BlobEndpoint", "http://127.0.0.1:10000"))
+    try:
+        with socket.create_connection((endpoint.hostname, endpoint.port or 80), timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+pytestmark = pytest.mark.skipif(not _azurite_reachable(), reason="Azurite blob emulator is not reachable")
+
+# Several blocks, with a short last one
+PAYLOAD = os.urandom(3 * 1024 * 1024 + 12345)
+BLOCK_SIZE = 1024 * 1024
+
+
+@pytest.fixture
+def run(monkeypatch):
+    """
+    Runs a test coroutine with a fresh AsyncBlobStorage on Azurite and a scratch container,
+    deleted afterwards.
+    """
+    monkeypatch.setenv("AZURE_STORAGE_CONNECTION_STRING", AZURITE_CONNECTION_STRING)
+    from utils.azure_blob_async import AsyncBlobStorage
+
+    def runner(test):
+        async def main():
+            storage = AsyncBlobStorage()
+            container = f"test-{uuid.uuid4().hex[:12]}"
+            try:
+                return await test(storage, container)
+            finally:
+                await storage.blob_service_client.delete_container(container)
+                await storage.close()
+        return asyncio.run(main())
+
+    return runner
+
+
+async def _aiter(data, chunk_size):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+def test_upload_file_round_trip(run, tmp_path):
+    async def test(storage, container):
+        source = tmp_path / "source.bin"
+        source.write_bytes(PAYLOAD)
+        url = await storage.upload_file("upload/source.bin", str(source), container)
+        assert url.endswith(f"/{container}/upload/source.bin")
+
+        destination = tmp_path / "copy.bin"
+        assert await storage.download_to("upload/source.bin", container, str(destination)) == len(PAYLOAD)
+        assert destination.read_bytes() == PAYLOAD
+        assert len(storage.upload_metrics) == 1
+
+    run(test)
+
+
+def test_upload_file_compressed(run):
+    async def test(storage, container):
+        await storage.upload_file("data.csv.gz", PAYLOAD, container, content_encoding="gzip")
+
+        properties = await storage.get_properties("data.csv.gz", container)
+        assert properties.content_settings.content_encoding == "gzip"
+        stored = b"".join([chunk async for chunk in storage.iter_chunks("data.csv.gz", container)])
+        assert gzip.decompress(stored) == PAYLOAD
+        assert await storage.download_file("data.csv.gz", container) == PAYLOAD
+
+    run(test)
+
+
+def test_upload_stream_stages_blocks(run, tmp_path):
+    async def test(storage, container):
+        await storage.upload_stream("stream.bin", _aiter(PAYLOAD, 100 * 1024), container,
+                                    max_concurrency=2, block_size=BLOCK_SIZE)
+
+        properties = await storage.get_properties("stream.bin", container)
+        assert properties.size == len(PAYLOAD)
+        destination = tmp_path / "stream.bin"
+        await storage.download_to("stream.bin", container, str(destination), max_concurrency=4)
+        assert destination.read_bytes() == PAYLOAD
+
+    run(test)
+
+
+def test_upload_stream_compressed(run, tmp_path):
+    async def test(storage, container):
+        await storage.upload_stream("stream.zst", _aiter(PAYLOAD, 100 * 1024), container,
+                                    block_size=BLOCK_SIZE, content_encoding="zstd")
+
+        destination = tmp_path / "stream.bin"
+        assert await storage.download_to("stream.zst", container, str(destination)) == len(PAYLOAD)
+        assert destination.read_bytes() == PAYLOAD
+        decoded = b"".join([chunk async for chunk in storage.iter_chunks("stream.zst", container, decode=True)])
+        assert decoded == PAYLOAD
+
+    run(test)
+
+
+def test_download_to_missing_blob(run, tmp_path):
+    async def test(storage, container):
+        with pytest.raises(FileNotFoundError):
+            await storage.download_to("missing.bin", container, str(tmp_path / "missing.bin"))
+
+    run(test)
+
+
+def test_iter_chunks_range_and_etag(run):
+    async def test(storage, container):
+        await storage.upload_file("range.bin", PAYLOAD, container)
+
+        chunks = [chunk async for chunk in storage.iter_chunks("range.bin", container, offset=1000, length=5000)]
+        assert b"".join(chunks) == PAYLOAD[1000:6000]
+
+        etag = (await storage.get_properties("range.bin", container)).etag
+        assert b"".join([chunk async for chunk in storage.iter_chunks("range.bin", container, etag=etag)]) == PAYLOAD
+
+        # Overwritten since the ETag was read: the conditional read must fail
+        await storage.upload_file("range.bin", b"changed", container)
+        with pytest.raises(Exception):
+            [chunk async for chunk in storage.iter_chunks("range.bin", container, etag=etag)]
+
+        with pytest.raises(FileNotFoundError):
+            [chunk async for chunk in storage.iter_chunks("missing.bin", container)]
+
+    run(test)
+
+
+def test_delete_files_batches(run, monkeypatch):
+    import utils.azure_blob_async as azure_blob_async
+    # Force several batch requests
+    monkeypatch.setattr(azure_blob_async, "DELETE_BATCH_SIZE", 3)
+
+    async def test(storage, container):
+        names = [f"job/{idx}.json" for idx in range(7)]
+        for name in names:
+            await storage.upload_file(name, b"{}", container)
+        await storage.upload_file("keep.json", b"{}", container)
+
+        # Duplicates are deleted once and missing blobs are skipped
+        assert await storage.delete_files(names + names[:2] + ["job/missing.json"], container) == len(names)
+        assert [properties.name for properties in await storage.list_files("", container)] == ["keep.json"]
+        assert await storage.delete_files([], container) == 0
+
+    run(test)
@@ -1,4 +1,5 @@
 import os
+import io
 import librosa
 import numpy as np
 import soundfile as sf
@@ -12,10 +13,10 @@ output_folder = os.getenv("LOCAL_OUTPUT_FOLDER", "/tmp/processed_audio")
 os.makedirs(output_folder, exist_ok=True)
 
 
-def process_audio(file_path):
+def process_audio(file_path, output_file=None):
     """
     Loads an audio file, applies noise reduction, reverberation removal, and VAD segmentation.
-    Saves the processed audio to a specified directory.
+    Saves the processed audio to `output_file` (default: same file name in the output folder).
     """
     try:
         logging.info(f"Processing file: {file_path}")
@@ -59,7 +60,7 @@ def process_audio(file_path):
             processed_chunks.append(processed_chunk)
 
         final_audio = np.concatenate(processed_chunks)
-        output_file = os.path.join(output_folder, os.path.basename(file_path))
+        output_file = output_file or os.path.join(output_folder, os.path.basename(file_path))
 
         # Save processed audio
         # output_path = os.path.join(output_folder, f"{job_id}_processed.wav")
@@ -74,6 +75,64 @@ def process_audio(file_path):
     
 CHUNK_DURATION = 10 * 60  # 10 minutes
 
+def probe_duration(file_obj):
+    """
+    Reads the audio duration (in seconds) from the file header without decoding the samples.
+    Restores the stream position; returns None if the format cannot be probed.
+    """
+    position = file_obj.tell()
+    try:
+        return sf.info(file_obj).duration
+    except Exception as e:
+        logging.warning(f"Could not probe audio duration: {str(e)}")
+        return None
+    finally:
+        file_obj.seek(position)
+
+# Magic numbers of formats that store the duration in their header (WAV, RF64, W64, FLAC, AIFF)
+HEADER_DURATION_MAGIC = (b"RIFF", b"RF64", b"riff", b"fLaC", b"FORM")
+
+class _HeaderOnlyFile(io.RawIOBase):
+    """
+    Read-only view of the first bytes of a file of `size` bytes: seeking covers the whole file,
+    reads past the header return nothing.
+    """
+    def __init__(self, header, size):
+        self.header = header
+        self.size = size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence]
+        self.position = max(0, base + offset)
+        return self.position
+
+    def readinto(self, buffer):
+        data = self.header[self.position:self.position + len(buffer)]
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+def probe_header_duration(header, size):
+    """
+    Reads the audio duration (in seconds) from the first bytes of a file of `size` bytes, e.g. a
+    ranged read of a blob. Only formats with the duration in their header are probed (libsndfile
+    scans the data of others, e.g. Ogg, and may crash on the missing part); returns None otherwise.
+    """
+    if not header.startswith(HEADER_DURATION_MAGIC):
+        logging.warning("Could not probe audio duration: format has no duration in its header.")
+        return None
+    return probe_duration(_HeaderOnlyFile(header, size))
+
 def bandpass_filter(data, lowcut, highcut, fs, order=5):
     """
     Applies a bandpass filter that retains frequencies typically associated with the human voice.
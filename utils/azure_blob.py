@@ -1,15 +1,52 @@
 # Handles Azure Blob Storage operations
 import os
+import io
+import uuid
+import base64
 import logging
-from azure.storage.blob import BlobServiceClient, ContentSettings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+from datetime import datetime, timedelta, timezone
+from azure.storage.blob import BlobServiceClient, BlobBlock, BlobSasPermissions, ContentSettings, generate_blob_sas
 from dotenv import load_dotenv
+from utils.blob_cache import BlobCache
+from utils.compression import Decompressor, decompress, iter_compressed
+from utils.storage import Storage, DELETE_BATCH_SIZE, UPLOAD_METRICS_WINDOW, _UploadTimer, _data_size
 
 
 
 # Load environment variables
 load_dotenv()
 
-class BlobStorage:
+# Downloads: blobs up to BLOB_DOWNLOAD_CHUNK_MB are fetched in one request, larger ones in
+# range requests of that size, BLOB_DOWNLOAD_CONCURRENCY at a time
+BLOB_DOWNLOAD_CHUNK_MB = int(os.getenv("BLOB_DOWNLOAD_CHUNK_MB", "4"))
+BLOB_DOWNLOAD_CONCURRENCY = int(os.getenv("BLOB_DOWNLOAD_CONCURRENCY", "4"))
+
+# Uploads: data up to BLOB_UPLOAD_SINGLE_PUT_MB goes up in one request, larger data as blocks of
+# BLOB_UPLOAD_BLOCK_MB, BLOB_UPLOAD_CONCURRENCY at a time
+BLOB_UPLOAD_BLOCK_MB = int(os.getenv("BLOB_UPLOAD_BLOCK_MB", "4"))
+BLOB_UPLOAD_SINGLE_PUT_MB = int(os.getenv("BLOB_UPLOAD_SINGLE_PUT_MB", "8"))
+BLOB_UPLOAD_CONCURRENCY = int(os.getenv("BLOB_UPLOAD_CONCURRENCY", "4"))
+
+# Local read-through cache for `download_file(cached=True)` / `cached_path` (empty dir disables):
+# max size, and seconds a cached copy is trusted before it is revalidated by ETag
+BLOB_CACHE_DIR = os.getenv("BLOB_CACHE_DIR", "/tmp/blob_cache")
+BLOB_CACHE_MAX_MB = int(os.getenv("BLOB_CACHE_MAX_MB", "10240"))
+BLOB_CACHE_TTL_SECONDS = float(os.getenv("BLOB_CACHE_TTL_SECONDS", "60"))
+
+# Transfer sizes passed to every (sync or async) BlobServiceClient
+CLIENT_TRANSFER_OPTIONS = {
+    "max_single_get_size": BLOB_DOWNLOAD_CHUNK_MB * 1024 * 1024,
+    "max_chunk_get_size": BLOB_DOWNLOAD_CHUNK_MB * 1024 * 1024,
+    "max_block_size": BLOB_UPLOAD_BLOCK_MB * 1024 * 1024,
+    "max_single_put_size": BLOB_UPLOAD_SINGLE_PUT_MB * 1024 * 1024
+}
+
+
+class BlobStorage(Storage):
     def __init__(self):
         """
         Initializes connection to Azure Blob Storage.
@@ -20,45 +57,83 @@ class BlobStorage:
             if not self.connection_string:
                 raise ValueError("Missing Azure Storage connection string in environment variables.")
 
-            self.blob_service_client = BlobServiceClient.from_connection_string(self.connection_string)
+            self.blob_service_client = BlobServiceClient.from_connection_string(self.connection_string, **CLIENT_TRANSFER_OPTIONS)
+            self.upload_metrics = deque(maxlen=UPLOAD_METRICS_WINDOW)
+            self.cache = BlobCache(BLOB_CACHE_DIR, BLOB_CACHE_MAX_MB * 1024 * 1024, BLOB_CACHE_TTL_SECONDS) if BLOB_CACHE_DIR else None
+            # Container clients already known to exist, by container name
+            self._container_clients = {}
 
         except Exception as e:
             logging.error(f"Failed to initialize BlobStorage: {str(e)}")
             raise
 
+    def blob_url(self, file_name: str, container_name: str) -> str:
+        return self.blob_service_client.get_blob_client(container=container_name, blob=file_name).url
+
     def get_container_client(self, container_name: str):
         """
-        Retrieves the specified container client, creating it if it does not exist.
+        Retrieves the specified container client, creating the container if it does not exist.
+        Only the first call per container goes to the network; the client is cached after that.
         """
+        container_client = self._container_clients.get(container_name)
+        if container_client is not None:
+            return container_client
+
         try:
             container_client = self.blob_service_client.get_container_client(container_name)
 
-            if not container_client.exists():
-                logging.warning(f"Container '{container_name}' does not exist. Creating...")
+            try:
                 container_client.create_container()
+                logging.warning(f"Container '{container_name}' did not exist and was created.")
+            except ResourceExistsError:
+                pass
 
+            self._container_clients[container_name] = container_client
             return container_client
 
         except Exception as e:
             logging.error(f"Failed to get container '{container_name}': {str(e)}")
             raise
 
-    def upload_file(self, file_name: str, file_data, container_name: str, content_type="application/octet-stream") -> str:
+    def upload_file(self, file_name: str, file_data, container_name: str, content_type="application/octet-stream",
+                    max_concurrency=None, block_size=None, content_encoding=None) -> str:
         """
         Uploads a file to a specific Azure Blob Storage container.
+        Large files go up as blocks staged in parallel; throughput and time to first byte are
+        recorded (see `upload_stats`).
         
         :param file_name: Name of the blob (unique filename)
-        :param file_data: File stream or binary data
+        :param file_data: File stream, binary data or local file path
         :param container_name: Name of the Azure Blob container
         :param content_type: MIME type of the file
+        :param max_concurrency: Blocks uploaded in parallel (default BLOB_UPLOAD_CONCURRENCY)
+        :param block_size: Block size in bytes (default BLOB_UPLOAD_BLOCK_MB)
+        :param content_encoding: Compress the data on the way up ("gzip" or "zstd") and store it with
+                                 that Content-Encoding; downloads decompress it transparently
         :return: URL of the uploaded file
         """
+        if isinstance(file_data, (str, os.PathLike)):
+            with open(file_data, "rb") as f:
+                return self.upload_file(file_name, f, container_name, content_type, max_concurrency, block_size,
+                                        content_encoding)
+
+        if block_size or content_encoding:
+            # Custom block size or compression: stage the blocks ourselves
+            stream = io.BytesIO(file_data) if isinstance(file_data, (bytes, bytearray)) else file_data
+            read_size = block_size or BLOB_UPLOAD_BLOCK_MB * 1024 * 1024
+            return self.upload_stream(file_name, iter(lambda: stream.read(read_size), b""), container_name,
+                                      content_type, max_concurrency, block_size, content_encoding)
+
         try:
             container_client = self.get_container_client(container_name)
             blob_client = container_client.get_blob_client(blob=file_name)
 
-            blob_client.upload_blob(file_data, overwrite=True, content_settings=ContentSettings(content_type=content_type))
-            logging.info(f"File '{file_name}' uploaded successfully to '{container_name}'.")
+            timer = _UploadTimer()
+            blob_client.upload_blob(file_data, overwrite=True, content_settings=ContentSettings(content_type=content_type),
+                                    max_concurrency=max_concurrency or BLOB_UPLOAD_CONCURRENCY,
+                                    raw_response_hook=timer.on_response)
+            self._record_upload(file_name, container_name, _data_size(file_data), timer)
+            self._invalidate_cached(file_name, container_name)
 
             return blob_client.url
 
@@ -66,32 +141,255 @@ class BlobStorage:
             logging.error(f"Upload failed for '{file_name}' in '{container_name}': {str(e)}")
             raise
 
-    def download_file(self, file_name: str, container_name: str) -> bytes:
+    def upload_stream(self, file_name: str, chunks, container_name: str, content_type="application/octet-stream",
+                      max_concurrency=None, block_size=None, content_encoding=None) -> str:
+        """
+        Uploads data produced by an iterator (e.g. a request body or a file being written) as a
+        block blob, without knowing its size upfront. Chunks are regrouped into blocks of
+        `block_size` that are staged while the iterator keeps producing, with at most
+        `max_concurrency` blocks in flight; the blob appears once the block list is committed.
+
+        :param file_name: Name of the blob
+        :param chunks: Iterable of bytes
+        :param container_name: Name of the Azure Blob container
+        :param content_type: MIME type of the file
+        :param max_concurrency: Blocks uploaded in parallel (default BLOB_UPLOAD_CONCURRENCY)
+        :param block_size: Block size in bytes (default BLOB_UPLOAD_BLOCK_MB)
+        :param content_encoding: Compress the chunks ("gzip" or "zstd") and store the blob with that Content-Encoding
+        :return: URL of the uploaded file
         """
-        Downloads a file from Azure Blob Storage.
+        block_size = block_size or BLOB_UPLOAD_BLOCK_MB * 1024 * 1024
+        max_concurrency = max_concurrency or BLOB_UPLOAD_CONCURRENCY
+        if content_encoding:
+            chunks = iter_compressed(chunks, content_encoding)
+
+        try:
+            container_client = self.get_container_client(container_name)
+            blob_client = container_client.get_blob_client(blob=file_name)
+
+            timer = _UploadTimer()
+            # Block ids must all have the same length within a blob
+            prefix = uuid.uuid4().hex
+            block_ids, pending, size = [], set(), 0
+
+            def stage(block_id, block):
+                blob_client.stage_block(block_id, block, raw_response_hook=timer.on_response)
+
+            with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+                for block in _rechunk(chunks, block_size):
+                    if len(pending) >= max_concurrency:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+
+                    block_id = base64.b64encode(f"{prefix}-{len(block_ids):08d}".encode()).decode()
+                    block_ids.append(block_id)
+                    size += len(block)
+                    pending.add(executor.submit(stage, block_id, block))
+
+                for future in pending:
+                    future.result()
+
+            blob_client.commit_block_list([BlobBlock(block_id=block_id) for block_id in block_ids],
+                                          content_settings=ContentSettings(content_type=content_type,
+                                                                           content_encoding=content_encoding),
+                                          raw_response_hook=timer.on_response)
+            self._record_upload(file_name, container_name, size, timer)
+            self._invalidate_cached(file_name, container_name)
+
+            return blob_client.url
+
+        except Exception as e:
+            logging.error(f"Streaming upload failed for '{file_name}' in '{container_name}': {str(e)}")
+            raise
+
+    def append_file(self, file_name: str, data, container_name: str, create=False, content_type="application/octet-stream") -> str:
+        """
+        Appends data to an append blob, creating the blob if it does not exist yet.
+
+        :param file_name: Name of the append blob
+        :param data: Bytes or text to append
+        :param container_name: Name of the Azure Blob container
+        :param create: Start a new (empty) blob, replacing any existing one
+        :param content_type: MIME type set when the blob is created
+        :return: URL of the append blob
+        """
+        try:
+            container_client = self.get_container_client(container_name)
+            blob_client = container_client.get_blob_client(blob=file_name)
+
+            if create:
+                blob_client.create_append_blob(content_settings=ContentSettings(content_type=content_type))
+            if data:
+                try:
+                    blob_client.append_block(data)
+                except ResourceNotFoundError:
+                    blob_client.create_append_blob(content_settings=ContentSettings(content_type=content_type))
+                    blob_client.append_block(data)
+            self._invalidate_cached(file_name, container_name)
+
+            return blob_client.url
+
+        except Exception as e:
+            logging.error(f"Append failed for '{file_name}' in '{container_name}': {str(e)}")
+            raise
+
+    def download_file(self, file_name: str, container_name: str, cached=False) -> bytes:
+        """
+        Downloads a file from Azure Blob Storage into memory, decompressed if it was stored with
+        a Content-Encoding. Meant for small blobs; use `download_to` for audio and other large files.
         
         :param file_name: Name of the blob to download
         :param container_name: Name of the Azure Blob container
+        :param cached: Read through the local blob cache (see `cached_path`)
         :return: File content in bytes
         """
+        if cached and self.cache is not None:
+            with open(self.cached_path(file_name, container_name), "rb") as f:
+                return f.read()
+
         try:
             container_client = self.get_container_client(container_name)
             blob_client = container_client.get_blob_client(blob=file_name)
 
-            if not blob_client.exists():
-                raise FileNotFoundError(f"Blob '{file_name}' not found in container '{container_name}'.")
-
-            file_data = blob_client.download_blob().readall()
+            downloader = blob_client.download_blob(decompress=False)
+            file_data = decompress(downloader.readall(), downloader.properties.content_settings.content_encoding)
             logging.info(f"File '{file_name}' downloaded successfully.")
             return file_data
 
-        except FileNotFoundError as e:
-            logging.error(str(e))
+        except ResourceNotFoundError:
+            message = f"Blob '{file_name}' not found in container '{container_name}'."
+            logging.error(message)
+            raise FileNotFoundError(message)
+        except Exception as e:
+            logging.error(f"Download failed for '{file_name}' in '{container_name}': {str(e)}")
             raise
+
+    def download_to(self, file_name: str, container_name: str, destination, max_concurrency=None) -> int:
+        """
+        Streams a blob into a local file without holding it in memory: the blob is fetched in
+        range requests of BLOB_DOWNLOAD_CHUNK_MB, up to `max_concurrency` in parallel, and each
+        chunk is written to the destination as it arrives. Compressed blobs (Content-Encoding) are
+        fetched in order and decompressed on the fly.
+
+        :param file_name: Name of the blob to download
+        :param container_name: Name of the Azure Blob container
+        :param destination: Local path or writable binary file object (parallel range requests
+                            need a seekable one; others are written sequentially)
+        :param max_concurrency: Parallel range requests (default BLOB_DOWNLOAD_CONCURRENCY)
+        :return: Number of bytes written
+        """
+        try:
+            container_client = self.get_container_client(container_name)
+            blob_client = container_client.get_blob_client(blob=file_name)
+            max_concurrency = max_concurrency or BLOB_DOWNLOAD_CONCURRENCY
+
+            def download_into(f, concurrency):
+                downloader = blob_client.download_blob(max_concurrency=concurrency, decompress=False)
+                encoding = downloader.properties.content_settings.content_encoding
+                return _write_decompressed(downloader.chunks(), encoding, f) if encoding else downloader.readinto(f)
+
+            if isinstance(destination, (str, os.PathLike)):
+                with open(destination, "wb") as f:
+                    size = download_into(f, max_concurrency)
+            else:
+                seekable = getattr(destination, "seekable", lambda: False)()
+                size = download_into(destination, max_concurrency if seekable else 1)
+
+            logging.info(f"File '{file_name}' downloaded successfully ({size} bytes).")
+            return size
+
+        except ResourceNotFoundError:
+            message = f"Blob '{file_name}' not found in container '{container_name}'."
+            logging.error(message)
+            raise FileNotFoundError(message)
         except Exception as e:
             logging.error(f"Download failed for '{file_name}' in '{container_name}': {str(e)}")
             raise
 
+    def iter_chunks(self, file_name: str, container_name: str, offset=None, length=None, etag=None, decode=False):
+        """
+        Yields the content of a blob chunk by chunk (BLOB_DOWNLOAD_CHUNK_MB each), e.g. to stream it
+        into a response. Compressed blobs are yielded as stored unless `decode` is set.
+
+        :param file_name: Name of the blob to download
+        :param container_name: Name of the Azure Blob container
+        :param offset: First byte to read (default: start of the blob)
+        :param length: Number of bytes to read (default: through the end)
+        :param etag: Only read the blob while it still has this ETag (fails if it was overwritten)
+        :param decode: Decompress a blob stored with a Content-Encoding (whole blob only, no offset)
+        """
+        container_client = self.get_container_client(container_name)
+        blob_client = container_client.get_blob_client(blob=file_name)
+        conditions = {"etag": etag, "match_condition": MatchConditions.IfNotModified} if etag else {}
+        try:
+            downloader = blob_client.download_blob(offset, length, decompress=False, **conditions)
+        except ResourceNotFoundError:
+            raise FileNotFoundError(f"Blob '{file_name}' not found in container '{container_name}'.")
+
+        decompressor = Decompressor(downloader.properties.content_settings.content_encoding if decode else None)
+        for chunk in downloader.chunks():
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+
+    def get_properties(self, file_name: str, container_name: str):
+        """
+        Returns the properties (size, etag, content settings, ...) of a blob, or None if it does not exist.
+        """
+        container_client = self.get_container_client(container_name)
+        try:
+            return container_client.get_blob_client(blob=file_name).get_blob_properties()
+        except ResourceNotFoundError:
+            return None
+
+    def generate_upload_url(self, file_name: str, container_name: str, expiry_minutes: int = 15) -> str:
+        """
+        Issues a SAS URL that lets a client upload (create/write) this one blob directly to storage,
+        valid for `expiry_minutes`. The URL grants no read, list or delete access.
+        """
+        self.get_container_client(container_name)
+        return _upload_sas_url(self.blob_service_client, file_name, container_name, expiry_minutes)
+
+    def cached_path(self, file_name: str, container_name: str) -> str:
+        """
+        Returns the path of a local copy of the blob from the node's blob cache. Within
+        BLOB_CACHE_TTL_SECONDS of the last check the copy is used as is; after that it costs one
+        HEAD request, plus a download only if the blob changed. Treat the file as read-only.
+        """
+        if self.cache is None:
+            raise RuntimeError("Blob cache is disabled (BLOB_CACHE_DIR is empty).")
+
+        container_client = self.get_container_client(container_name)
+        blob_client = container_client.get_blob_client(blob=file_name)
+
+        def head():
+            properties = self.get_properties(file_name, container_name)
+            return properties.etag if properties is not None else None
+
+        def download(path):
+            try:
+                downloader = blob_client.download_blob(max_concurrency=BLOB_DOWNLOAD_CONCURRENCY, decompress=False)
+            except ResourceNotFoundError:
+                raise FileNotFoundError(f"Blob '{file_name}' not found in container '{container_name}'.")
+            encoding = downloader.properties.content_settings.content_encoding
+            with open(path, "wb") as f:
+                if encoding:
+                    _write_decompressed(downloader.chunks(), encoding, f)
+                else:
+                    downloader.readinto(f)
+            logging.info(f"File '{file_name}' downloaded into the blob cache.")
+            return downloader.properties.etag
+
+        return self.cache.get(container_name, file_name, head, download)
+
+    def local_path(self, file_name: str, container_name: str):
+        return self.cached_path(file_name, container_name) if self.cache is not None else None
+
+    def _invalidate_cached(self, file_name, container_name):
+        if self.cache is not None:
+            self.cache.invalidate(container_name, file_name)
+
     def delete_file(self, file_name: str, container_name: str) -> bool:
         """
         Deletes a file from Azure Blob Storage.
@@ -104,14 +402,120 @@ class BlobStorage:
             container_client = self.get_container_client(container_name)
             blob_client = container_client.get_blob_client(blob=file_name)
 
-            if not blob_client.exists():
+            self._invalidate_cached(file_name, container_name)
+            try:
+                blob_client.delete_blob()
+            except ResourceNotFoundError:
                 logging.warning(f"Blob '{file_name}' does not exist in '{container_name}'.")
                 return False
 
-            blob_client.delete_blob()
             logging.info(f"File '{file_name}' deleted successfully from '{container_name}'.")
             return True
 
         except Exception as e:
             logging.error(f"Deletion failed for '{file_name}' in '{container_name}': {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def list_files(self, prefix: str, container_name: str):
+        """
+        Lists the blobs whose names start with `prefix`, e.g. all audio of a user on a day
+        (see `utils.storage.user_blob_prefix`). The service pages through up to 5000 names per request.
+
+        :param prefix: Blob name prefix
+        :param container_name: Name of the Azure Blob container
+        :return: List of BlobProperties (`name`, `size`, `etag`, `last_modified`, ...)
+        """
+        try:
+            container_client = self.get_container_client(container_name)
+            return list(container_client.list_blobs(name_starts_with=prefix))
+
+        except Exception as e:
+            logging.error(f"Listing failed for '{prefix}' in '{container_name}': {str(e)}")
+            raise
+
+    def delete_files(self, file_names, container_name: str) -> int:
+        """
+        Deletes many blobs of a container with batch requests (DELETE_BATCH_SIZE blobs each)
+        instead of one request per blob. Missing blobs are skipped.
+
+        :param file_names: Names of the blobs to delete
+        :param container_name: Name of the Azure Blob container
+        :return: Number of blobs deleted
+        """
+        names = list(dict.fromkeys(file_names))
+        container_client = self.get_container_client(container_name)
+        deleted, failed = 0, []
+
+        for start in range(0, len(names), DELETE_BATCH_SIZE):
+            batch = names[start:start + DELETE_BATCH_SIZE]
+            for file_name in batch:
+                self._invalidate_cached(file_name, container_name)
+            responses = container_client.delete_blobs(*batch, raise_on_any_failure=False)
+            for file_name, response in zip(batch, responses):
+                deleted, failed = _count_deletion(file_name, response.status_code, deleted, failed)
+
+        if failed:
+            message = f"(delete_files): Failed deleting {len(failed)} blob(s) from '{container_name}': {failed[:10]}"
+            logging.error(message)
+            raise RuntimeError(message)
+
+        logging.info(f"Deleted {deleted} of {len(names)} blob(s) from '{container_name}'.")
+        return deleted
+
+
+def _count_deletion(file_name, status_code, deleted, failed):
+    """
+    Tallies one sub-response of a batched delete (202: deleted, 404: already gone).
+    """
+    if status_code == 202:
+        return deleted + 1, failed
+    if status_code != 404:
+        failed.append(file_name)
+    return deleted, failed
+
+
+def _upload_sas_url(blob_service_client, file_name, container_name, expiry_minutes):
+    credential = blob_service_client.credential
+    if not getattr(credential, "account_key", None):
+        raise ValueError("Issuing upload URLs needs an account key in AZURE_STORAGE_CONNECTION_STRING.")
+
+    now = datetime.now(timezone.utc)
+    sas_token = generate_blob_sas(
+        account_name=blob_service_client.account_name,
+        container_name=container_name,
+        blob_name=file_name,
+        account_key=credential.account_key,
+        permission=BlobSasPermissions(create=True, write=True),
+        # Tolerate clock skew between us and the storage service
+        start=now - timedelta(minutes=5),
+        expiry=now + timedelta(minutes=expiry_minutes)
+    )
+    blob_url = blob_service_client.get_blob_client(container=container_name, blob=file_name).url
+    return f"{blob_url}?{sas_token}"
+
+
+def _write_decompressed(chunks, encoding, destination):
+    """
+    Writes compressed chunks to a file object decompressed; returns the number of bytes written.
+    """
+    decompressor = Decompressor(encoding)
+    size = 0
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        destination.write(data)
+        size += len(data)
+    return size
+
+
+def _rechunk(chunks, block_size):
+    """
+    Regroups an iterable of byte chunks into blocks of exactly `block_size` bytes (the last may be shorter).
+    """
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer.extend(chunk)
+        while len(buffer) >= block_size:
+            yield bytes(buffer[:block_size])
+            del buffer[:block_size]
+    if buffer:
+        yield bytes(buffer)
@@ -0,0 +1,454 @@
+# Handles Azure Blob Storage operations from async code (FastAPI endpoints)
+import os
+import io
+import uuid
+import base64
+import asyncio
+import logging
+from collections import deque
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.storage.blob import BlobBlock, ContentSettings
+from azure.storage.blob.aio import BlobServiceClient
+from utils.compression import Compressor, Decompressor, decompress
+from utils.storage import Storage, DELETE_BATCH_SIZE, UPLOAD_METRICS_WINDOW, _UploadTimer, _data_size
+from utils.azure_blob import (
+    CLIENT_TRANSFER_OPTIONS, BLOB_DOWNLOAD_CONCURRENCY, BLOB_UPLOAD_BLOCK_MB, BLOB_UPLOAD_CONCURRENCY,
+    _count_deletion, _upload_sas_url
+)
+
+
+# Max pooled HTTP connections to the storage account, shared by all requests of the process
+BLOB_HTTP_POOL_SIZE = int(os.getenv("BLOB_HTTP_POOL_SIZE", "100"))
+
+
+class AsyncBlobStorage(Storage):
+    """
+    asyncio counterpart of `BlobStorage` with the same methods, as coroutines.
+    Uploads and downloads don't block the event loop, so a slow client only holds its own request.
+
+    All requests go through one aiohttp session (connection pool of BLOB_HTTP_POOL_SIZE), created
+    on first use inside the running loop; call `close` on application shutdown.
+    """
+    def __init__(self):
+        self.connection_string = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+
+        if not self.connection_string:
+            raise ValueError("Missing Azure Storage connection string in environment variables.")
+
+        self.upload_metrics = deque(maxlen=UPLOAD_METRICS_WINDOW)
+        self._session = None
+        self._blob_service_client = None
+        self._container_clients = {}
+
+    @property
+    def blob_service_client(self):
+        if self._blob_service_client is None:
+            import aiohttp
+
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=BLOB_HTTP_POOL_SIZE))
+            self._blob_service_client = BlobServiceClient.from_connection_string(
+                self.connection_string,
+                transport=AioHttpTransport(session=self._session, session_owner=False),
+                **CLIENT_TRANSFER_OPTIONS
+            )
+        return self._blob_service_client
+
+    async def close(self):
+        """
+        Closes the service client and its pooled HTTP session.
+        """
+        if self._blob_service_client is not None:
+            await self._blob_service_client.close()
+            await self._session.close()
+            self._blob_service_client, self._session = None, None
+            self._container_clients = {}
+
+    def blob_url(self, file_name: str, container_name: str) -> str:
+        return self.blob_service_client.get_blob_client(container=container_name, blob=file_name).url
+
+    async def get_container_client(self, container_name: str):
+        """
+        Retrieves the specified container client, creating the container if it does not exist.
+        Only the first call per container goes to the network; the client is cached after that.
+        """
+        container_client = self._container_clients.get(container_name)
+        if container_client is not None:
+            return container_client
+
+        try:
+            container_client = self.blob_service_client.get_container_client(container_name)
+
+            try:
+                await container_client.create_container()
+                logging.warning(f"Container '{container_name}' did not exist and was created.")
+            except ResourceExistsError:
+                pass
+
+            self._container_clients[container_name] = container_client
+            return container_client
+
+        except Exception as e:
+            logging.error(f"Failed to get container '{container_name}': {str(e)}")
+            raise
+
+    async def upload_file(self, file_name: str, file_data, container_name: str, content_type="application/octet-stream",
+                          max_concurrency=None, block_size=None, content_encoding=None) -> str:
+        """
+        Uploads a file to a specific Azure Blob Storage container.
+
+        :param file_name: Name of the blob (unique filename)
+        :param file_data: File stream, binary data, local file path or async iterable of bytes
+        :param container_name: Name of the Azure Blob container
+        :param content_type: MIME type of the file
+        :param max_concurrency: Blocks uploaded in parallel (default BLOB_UPLOAD_CONCURRENCY)
+        :param block_size: Block size in bytes for async iterables (default BLOB_UPLOAD_BLOCK_MB)
+        :param content_encoding: Compress the data on the way up ("gzip" or "zstd") and store it with
+                                 that Content-Encoding; downloads decompress it transparently
+        :return: URL of the uploaded file
+        """
+        if isinstance(file_data, (str, os.PathLike)):
+            with open(file_data, "rb") as f:
+                return await self.upload_file(file_name, f, container_name, content_type, max_concurrency, block_size,
+                                              content_encoding)
+        if hasattr(file_data, "__aiter__"):
+            return await self.upload_stream(file_name, file_data, container_name, content_type, max_concurrency, block_size,
+                                            content_encoding)
+        if content_encoding:
+            # Compressed size is unknown up front: stream it through the compressor as staged blocks
+            stream = io.BytesIO(file_data) if isinstance(file_data, (bytes, bytearray)) else file_data
+            return await self.upload_stream(file_name, _read_async(stream, BLOB_UPLOAD_BLOCK_MB * 1024 * 1024), container_name,
+                                            content_type, max_concurrency, block_size, content_encoding)
+
+        try:
+            container_client = await self.get_container_client(container_name)
+            blob_client = container_client.get_blob_client(blob=file_name)
+
+            timer = _UploadTimer()
+            await blob_client.upload_blob(file_data, overwrite=True,
+                                          content_settings=ContentSettings(content_type=content_type,
+                                                                           content_encoding=content_encoding),
+                                          max_concurrency=max_concurrency or BLOB_UPLOAD_CONCURRENCY,
+                                          raw_response_hook=timer.on_response)
+            self._record_upload(file_name, container_name, _data_size(file_data), timer)
+
+            return blob_client.url
+
+        except Exception as e:
+            logging.error(f"Upload failed for '{file_name}' in '{container_name}': {str(e)}")
+            raise
+
+    async def upload_stream(self, file_name: str, chunks, container_name: str, content_type="application/octet-stream",
+                            max_concurrency=None, block_size=None, content_encoding=None) -> str:
+        """
+        Uploads data produced by an async iterable (e.g. `UploadFile` reads or a request body)
+        as a block blob, staging blocks of `block_size` while the iterable keeps producing, with
+        at most `max_concurrency` blocks in flight.
+
+        :param file_name: Name of the blob
+        :param chunks: Async iterable of bytes
+        :param container_name: Name of the Azure Blob container
+        :param content_type: MIME type of the file
+        :param max_concurrency: Blocks uploaded in parallel (default BLOB_UPLOAD_CONCURRENCY)
+        :param block_size: Block size in bytes (default BLOB_UPLOAD_BLOCK_MB)
+        :param content_encoding: Compress the chunks ("gzip" or "zstd") and store the blob with that Content-Encoding
+        :return: URL of the uploaded file
+        """
+        block_size = block_size or BLOB_UPLOAD_BLOCK_MB * 1024 * 1024
+        max_concurrency = max_concurrency or BLOB_UPLOAD_CONCURRENCY
+        if content_encoding:
+            chunks = _compress_async(chunks, content_encoding)
+
+        try:
+            container_client = await self.get_container_client(container_name)
+            blob_client = container_client.get_blob_client(blob=file_name)
+
+            timer = _UploadTimer()
+            # Block ids must all have the same length within a blob
+            prefix = uuid.uuid4().hex
+            block_ids, pending, size = [], set(), 0
+
+            async def stage(block_id, block):
+                await blob_client.stage_block(block_id, block, raw_response_hook=timer.on_response)
+
+            try:
+                async for block in _rechunk_async(chunks, block_size):
+                    if len(pending) >= max_concurrency:
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            task.result()
+
+                    block_id = base64.b64encode(f"{prefix}-{len(block_ids):08d}".encode()).decode()
+                    block_ids.append(block_id)
+                    size += len(block)
+                    pending.add(asyncio.ensure_future(stage(block_id, block)))
+
+                if pending:
+                    for task in (await asyncio.wait(pending))[0]:
+                        task.result()
+            except BaseException:
+                for task in pending:
+                    task.cancel()
+                raise
+
+            await blob_client.commit_block_list([BlobBlock(block_id=block_id) for block_id in block_ids],
+                                                content_settings=ContentSettings(content_type=content_type,
+                                                                                 content_encoding=content_encoding),
+                                                raw_response_hook=timer.on_response)
+            self._record_upload(file_name, container_name, size, timer)
+
+            return blob_client.url
+
+        except Exception as e:
+            logging.error(f"Streaming upload failed for '{file_name}' in '{container_name}': {str(e)}")
+            raise
+
+    async def append_file(self, file_name: str, data, container_name: str, create=False, content_type="application/octet-stream") -> str:
+        """
+        Appends data to an append blob, creating the blob if it does not exist yet.
+
+        :param file_name: Name of the append blob
+        :param data: Bytes or text to append
+        :param container_name: Name of the Azure Blob container
+        :param create: Start a new (empty) blob, replacing any existing one
+        :param content_type: MIME type set when the blob is created
+        :return: URL of the append blob
+        """
+        try:
+            container_client = await self.get_container_client(container_name)
+            blob_client = container_client.get_blob_client(blob=file_name)
+
+            if create:
+                await blob_client.create_append_blob(content_settings=ContentSettings(content_type=content_type))
+            if data:
+                try:
+                    await blob_client.append_block(data)
+                except ResourceNotFoundError:
+                    await blob_client.create_append_blob(content_settings=ContentSettings(content_type=content_type))
+                    await blob_client.append_block(data)
+
+            return blob_client.url
+
+        except Exception as e:
+            logging.error(f"Append failed for '{file_name}' in '{container_name}': {str(e)}")
+            raise
+
+    async def download_file(self, file_name: str, container_name: str) -> bytes:
+        """
+        Downloads a file from Azure Blob Storage into memory, decompressed if it was stored with
+        a Content-Encoding. Meant for small blobs; use `download_to` or `iter_chunks` for large files.
+
+        :param file_name: Name of the blob to download
+        :param container_name: Name of the Azure Blob container
+        :return: File content in bytes
+        """
+        try:
+            container_client = await self.get_container_client(container_name)
+            blob_client = container_client.get_blob_client(blob=file_name)
+
+            downloader = await blob_client.download_blob(decompress=False)
+            file_data = decompress(await downloader.readall(), downloader.properties.content_settings.content_encoding)
+            logging.info(f"File '{file_name}' downloaded successfully.")
+            return file_data
+
+        except ResourceNotFoundError:
+            message = f"Blob '{file_name}' not found in container '{container_name}'."
+            logging.error(message)
+            raise FileNotFoundError(message)
+        except Exception as e:
+            logging.error(f"Download failed for '{file_name}' in '{container_name}': {str(e)}")
+            raise
+
+    async def download_to(self, file_name: str, container_name: str, destination, max_concurrency=None) -> int:
+        """
+        Streams a blob into a local file without holding it in memory, with up to
+        `max_concurrency` parallel range requests. Compressed blobs (Content-Encoding) are
+        fetched in order and decompressed on the fly.
+
+        :param file_name: Name of the blob to download
+        :param container_name: Name of the Azure Blob container
+        :param destination: Local path or writable binary file object
+        :param max_concurrency: Parallel range requests (default BLOB_DOWNLOAD_CONCURRENCY)
+        :return: Number of bytes written
+        """
+        try:
+            container_client = await self.get_container_client(container_name)
+            blob_client = container_client.get_blob_client(blob=file_name)
+            max_concurrency = max_concurrency or BLOB_DOWNLOAD_CONCURRENCY
+
+            async def download_into(f, concurrency):
+                downloader = await blob_client.download_blob(max_concurrency=concurrency, decompress=False)
+                encoding = downloader.properties.content_settings.content_encoding
+                if not encoding:
+                    return await downloader.readinto(f)
+                decompressor, written = Decompressor(encoding), 0
+                async for chunk in downloader.chunks():
+                    data = decompressor.decompress(chunk)
+                    f.write(data)
+                    written += len(data)
+                return written
+
+            if isinstance(destination, (str, os.PathLike)):
+                with open(destination, "wb") as f:
+                    size = await download_into(f, max_concurrency)
+            else:
+                seekable = getattr(destination, "seekable", lambda: False)()
+                size = await download_into(destination, max_concurrency if seekable else 1)
+
+            logging.info(f"File '{file_name}' downloaded successfully ({size} bytes).")
+            return size
+
+        except ResourceNotFoundError:
+            message = f"Blob '{file_name}' not found in container '{container_name}'."
+            logging.error(message)
+            raise FileNotFoundError(message)
+        except Exception as e:
+            logging.error(f"Download failed for '{file_name}' in '{container_name}': {str(e)}")
+            raise
+
+    async def iter_chunks(self, file_name: str, container_name: str, offset=None, length=None, etag=None, decode=False):
+        """
+        Yields the content of a blob chunk by chunk, e.g. to stream it into a response.
+        Compressed blobs are yielded as stored unless `decode` is set.
+
+        :param file_name: Name of the blob to download
+        :param container_name: Name of the Azure Blob container
+        :param offset: First byte to read (default: start of the blob)
+        :param length: Number of bytes to read (default: through the end)
+        :param etag: Only read the blob while it still has this ETag (fails if it was overwritten)
+        :param decode: Decompress a blob stored with a Content-Encoding (whole blob only, no offset)
+        """
+        container_client = await self.get_container_client(container_name)
+        blob_client = container_client.get_blob_client(blob=file_name)
+        conditions = {"etag": etag, "match_condition": MatchConditions.IfNotModified} if etag else {}
+        try:
+            downloader = await blob_client.download_blob(offset, length, decompress=False, **conditions)
+        except ResourceNotFoundError:
+            raise FileNotFoundError(f"Blob '{file_name}' not found in container '{container_name}'.")
+
+        decompressor = Decompressor(downloader.properties.content_settings.content_encoding if decode else None)
+        async for chunk in downloader.chunks():
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+
+    async def get_properties(self, file_name: str, container_name: str):
+        """
+        Returns the properties (size, etag, content settings, ...) of a blob, or None if it does not exist.
+        """
+        container_client = await self.get_container_client(container_name)
+        try:
+            return await container_client.get_blob_client(blob=file_name).get_blob_properties()
+        except ResourceNotFoundError:
+            return None
+
+    async def generate_upload_url(self, file_name: str, container_name: str, expiry_minutes: int = 15) -> str:
+        """
+        Issues a SAS URL that lets a client upload (create/write) this one blob directly to storage,
+        valid for `expiry_minutes`. The URL grants no read, list or delete access.
+        """
+        await self.get_container_client(container_name)
+        return _upload_sas_url(self.blob_service_client, file_name, container_name, expiry_minutes)
+
+    async def delete_file(self, file_name: str, container_name: str) -> bool:
+        """
+        Deletes a file from Azure Blob Storage.
+
+        :param file_name: Name of the blob to delete
+        :param container_name: Name of the Azure Blob container
+        :return: True if deletion was successful, False if file did not exist
+        """
+        try:
+            container_client = await self.get_container_client(container_name)
+            blob_client = container_client.get_blob_client(blob=file_name)
+
+            try:
+                await blob_client.delete_blob()
+            except ResourceNotFoundError:
+                logging.warning(f"Blob '{file_name}' does not exist in '{container_name}'.")
+                return False
+
+            logging.info(f"File '{file_name}' deleted successfully from '{container_name}'.")
+            return True
+
+        except Exception as e:
+            logging.error(f"Deletion failed for '{file_name}' in '{container_name}': {str(e)}")
+            raise
+
+    async def list_files(self, prefix: str, container_name: str):
+        """
+        Lists the blobs whose names start with `prefix`.
+
+        :return: List of BlobProperties (`name`, `size`, `etag`, `last_modified`, ...)
+        """
+        try:
+            container_client = await self.get_container_client(container_name)
+            return [properties async for properties in container_client.list_blobs(name_starts_with=prefix)]
+
+        except Exception as e:
+            logging.error(f"Listing failed for '{prefix}' in '{container_name}': {str(e)}")
+            raise
+
+    async def delete_files(self, file_names, container_name: str) -> int:
+        """
+        Deletes many blobs of a container with batch requests (DELETE_BATCH_SIZE blobs each).
+        Missing blobs are skipped.
+
+        :return: Number of blobs deleted
+        """
+        names = list(dict.fromkeys(file_names))
+        container_client = await self.get_container_client(container_name)
+        deleted, failed = 0, []
+
+        for start in range(0, len(names), DELETE_BATCH_SIZE):
+            batch = names[start:start + DELETE_BATCH_SIZE]
+            responses = await container_client.delete_blobs(*batch, raise_on_any_failure=False)
+            statuses = [response.status_code async for response in responses]
+            for file_name, status_code in zip(batch, statuses):
+                deleted, failed = _count_deletion(file_name, status_code, deleted, failed)
+
+        if failed:
+            message = f"(delete_files): Failed deleting {len(failed)} blob(s) from '{container_name}': {failed[:10]}"
+            logging.error(message)
+            raise RuntimeError(message)
+
+        logging.info(f"Deleted {deleted} of {len(names)} blob(s) from '{container_name}'.")
+        return deleted
+
+
+async def _rechunk_async(chunks, block_size):
+    """
+    Regroups an async iterable of byte chunks into blocks of exactly `block_size` bytes (the last may be shorter).
+    """
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        while len(buffer) >= block_size:
+            yield bytes(buffer[:block_size])
+            del buffer[:block_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+async def _compress_async(chunks, encoding):
+    """
+    Compresses an async iterable of bytes chunk by chunk, off the event loop.
+    """
+    compressor = Compressor(encoding)
+    async for chunk in chunks:
+        data = await asyncio.to_thread(compressor.compress, chunk)
+        if data:
+            yield data
+    yield await asyncio.to_thread(compressor.flush)
+
+
+async def _read_async(stream, chunk_size):
+    """
+    Reads a binary file object in chunks without blocking the event loop.
+    """
+    while True:
+        chunk = await asyncio.to_thread(stream.read, chunk_size)
+        if not chunk:
+            return
+        yield chunk
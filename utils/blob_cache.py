@@ -0,0 +1,124 @@
+# Read-through local disk cache for blobs, validated by ETag
+import os
+import json
+import time
+import hashlib
+import logging
+
+
+class BlobCache:
+    """
+    Keeps downloaded blobs on local disk, keyed by container and blob name.
+
+    A cached copy younger than `ttl` seconds is used without any request; an older one is
+    revalidated with one HEAD request (ETag comparison) and downloaded again only if the blob
+    changed. When the cache grows past `max_bytes`, the least recently used entries are evicted.
+
+    Entries are plain files (`<key><ext>` plus a `meta/<key>.json` sidecar holding the ETag and
+    the last validation time) written via atomic renames, so the worker processes of a node can
+    share one cache directory.
+    """
+
+    def __init__(self, root: str, max_bytes: int, ttl: float = 0):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(os.path.join(root, "meta"), exist_ok=True)
+
+    def _paths(self, container_name, file_name):
+        key = hashlib.sha1(f"{container_name}/{file_name}".encode("utf-8")).hexdigest()
+        ext = os.path.splitext(file_name)[1][:16]
+        return os.path.join(self.root, f"{key}{ext}"), os.path.join(self.root, "meta", f"{key}.json")
+
+    def get(self, container_name: str, file_name: str, head, download) -> str:
+        """
+        Returns the path of an up-to-date local copy of the blob, fetching it if needed.
+        The file must be treated as read-only.
+
+        :param head: Callable `() -> etag` (None if the blob no longer exists)
+        :param download: Callable `(path) -> etag` that downloads the blob to `path`
+        """
+        data_path, meta_path = self._paths(container_name, file_name)
+        meta = self._read_meta(meta_path)
+
+        if meta is not None and os.path.exists(data_path):
+            if time.time() - meta["validated_at"] < self.ttl:
+                self._touch(data_path)
+                return data_path
+
+            etag = head()
+            if etag is None:
+                self.invalidate(container_name, file_name)
+                raise FileNotFoundError(f"Blob '{file_name}' not found in container '{container_name}'.")
+            if etag == meta["etag"]:
+                self._write_meta(meta_path, {**meta, "validated_at": time.time()})
+                self._touch(data_path)
+                return data_path
+
+        tmp_path = f"{data_path}.{os.getpid()}.part"
+        try:
+            etag = download(tmp_path)
+            os.replace(tmp_path, data_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._write_meta(meta_path, {"container": container_name, "name": file_name, "etag": etag, "validated_at": time.time()})
+
+        self.evict()
+        return data_path
+
+    def invalidate(self, container_name: str, file_name: str):
+        """
+        Drops the cached copy of a blob (e.g. after we overwrote or deleted it).
+        """
+        for path in self._paths(container_name, file_name)[::-1]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache fits in `max_bytes`.
+        """
+        entries, total = [], 0
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.name.endswith(".part") or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for victim in (path, os.path.join(self.root, "meta", os.path.basename(path).split(".", 1)[0] + ".json")):
+                try:
+                    os.remove(victim)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            logging.info(f"(BlobCache): Evicted '{path}' ({size} bytes).")
+
+    def _touch(self, path):
+        # The mtime orders entries for LRU eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _read_meta(meta_path):
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_meta(meta_path, meta):
+        tmp_path = f"{meta_path}.{os.getpid()}.part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
@@ -0,0 +1,136 @@
+# Serves blobs as streamed HTTP responses with Range and ETag support
+import re
+from email.utils import format_datetime
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+
+def parse_range(range_header, size):
+    """
+    Parses a single-range `Range: bytes=...` header.
+
+    :param range_header: Value of the Range header
+    :param size: Size of the blob in bytes
+    :return: (offset, length) of the requested range, None to serve the whole blob (no header,
+             another unit, several ranges, or an invalid range, which RFC 7233 says to ignore), or
+             "unsatisfiable" for a valid range outside the blob
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+
+    match = re.fullmatch(r"(\d*)-(\d*)", range_header[len("bytes="):].strip(), flags=re.ASCII)
+    if match is None or not any(match.groups()):
+        return None
+    start, end = match.groups()
+
+    if not start:
+        # Suffix range: the last N bytes
+        suffix = int(end)
+        if suffix == 0 or size == 0:
+            return "unsatisfiable"
+        start = max(0, size - suffix)
+        return start, size - start
+
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    if start >= size:
+        return "unsatisfiable"
+    end = min(int(end), size - 1) if end else size - 1
+    return start, end - start + 1
+
+
+def accepts_encoding(header, encoding):
+    """
+    Whether an Accept-Encoding header value allows the given content encoding (q=0 excludes it).
+    """
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        if token.strip().lower() in (encoding, "*"):
+            q = params.strip().removeprefix("q=") if params.strip().startswith("q=") else "1"
+            try:
+                return float(q) > 0
+            except ValueError:
+                return True
+    return False
+
+
+def etag_matches(header, etag):
+    """
+    Whether an If-None-Match / If-Range header value matches the ETag (weak comparison).
+    """
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    strip = lambda tag: tag.strip().removeprefix("W/")
+    return strip(etag) in {strip(tag) for tag in header.split(",")}
+
+
+async def stream_blob(request: Request, async_blob, file_name: str, container_name: str, download_name: str = None):
+    """
+    Streams a blob to the client chunk by chunk, so memory per request stays constant.
+
+    - `If-None-Match` with the current ETag returns 304 without a body.
+    - A single `Range: bytes=...` returns 206 with only those bytes (unless `If-Range` names
+      an older ETag, which returns the whole blob); a range past the end returns 416.
+    - The blob is read on condition of the ETag sent in the headers, so a client never gets
+      bytes of a newer version stitched to an older one.
+    - A blob stored compressed is sent as is with its Content-Encoding (ranges apply to the
+      compressed bytes) if the client's Accept-Encoding allows it; otherwise it is decompressed
+      on the fly and always sent whole.
+
+    :param async_blob: Async storage client (see `get_async_storage`)
+    :param download_name: Optional file name for a Content-Disposition attachment header
+    """
+    properties = await async_blob.get_properties(file_name, container_name)
+    if properties is None:
+        raise HTTPException(status_code=404, detail="File not found.")
+
+    etag, size = properties.etag, properties.size
+    if not etag.startswith(("\"", "W/")):
+        etag = f"\"{etag}\""
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, no-cache"
+    }
+    media_type = properties.content_settings.content_type or "application/octet-stream"
+    encoding = getattr(properties.content_settings, "content_encoding", None)
+    if properties.last_modified:
+        headers["Last-Modified"] = format_datetime(properties.last_modified, usegmt=True)
+
+    if encoding:
+        headers["Vary"] = "Accept-Encoding"
+        if not accepts_encoding(request.headers.get("accept-encoding"), encoding):
+            # Decoded size is unknown upfront: no ranges, no Content-Length
+            headers["Accept-Ranges"] = "none"
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers=headers)
+            if download_name:
+                headers["Content-Disposition"] = f"attachment; filename=\"{download_name}\""
+            body = async_blob.iter_chunks(file_name, container_name, etag=properties.etag, decode=True)
+            return StreamingResponse(body, headers=headers, media_type=media_type)
+        headers["Content-Encoding"] = encoding
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = parse_range(request.headers.get("range"), size)
+    if_range = request.headers.get("if-range")
+    if byte_range is not None and if_range and not etag_matches(if_range, etag):
+        byte_range = None
+    if byte_range == "unsatisfiable":
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    status_code, offset, length = 200, None, size
+    if byte_range is not None:
+        offset, length = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {offset}-{offset + length - 1}/{size}"
+    headers["Content-Length"] = str(length)
+    if download_name:
+        headers["Content-Disposition"] = f"attachment; filename=\"{download_name}\""
+
+    body = async_blob.iter_chunks(file_name, container_name, offset, length if offset is not None else None, etag=properties.etag) if length else iter(())
+    return StreamingResponse(body, status_code=status_code, headers=headers, media_type=media_type)
@@ -0,0 +1,91 @@
+# gzip / zstd content encodings for stored blobs
+import zlib
+
+
+# Content-Encoding values we write and decode
+CONTENT_ENCODINGS = ("gzip", "zstd")
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstd content encoding needs the 'zstandard' package.")
+    return zstandard
+
+
+def check_encoding(encoding):
+    if encoding not in CONTENT_ENCODINGS:
+        raise ValueError(f"Unsupported content encoding '{encoding}'. Choose one of {list(CONTENT_ENCODINGS)}.")
+
+
+class Compressor:
+    """
+    Incremental encoder for a content encoding: feed chunks to `compress`, then call `flush` once.
+
+    :param encoding: 'gzip' or 'zstd'
+    :param level: Compression level (default: 6 for gzip, 3 for zstd)
+    """
+    def __init__(self, encoding, level=None):
+        check_encoding(encoding)
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._encoder = zlib.compressobj(level if level is not None else 6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        else:
+            self._encoder = _zstd().ZstdCompressor(level=level if level is not None else 3).compressobj()
+
+    def compress(self, chunk):
+        return self._encoder.compress(chunk)
+
+    def flush(self):
+        return self._encoder.flush()
+
+
+def iter_compressed(chunks, encoding, level=None):
+    """
+    Compresses an iterable of bytes chunk by chunk.
+    """
+    compressor = Compressor(encoding, level)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class Decompressor:
+    """
+    Incremental decoder for a content encoding: feed compressed chunks to `decompress`.
+    Passes data through unchanged when the encoding is empty (not compressed).
+    """
+    def __init__(self, encoding):
+        self.encoding = encoding or None
+        if self.encoding == "gzip":
+            self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.encoding == "zstd":
+            self._decoder = _zstd().ZstdDecompressor().decompressobj()
+        elif self.encoding is not None:
+            check_encoding(self.encoding)
+
+    def decompress(self, chunk):
+        if not self.encoding or not chunk:
+            return chunk
+        return self._decoder.decompress(chunk)
+
+
+def iter_decompressed(chunks, encoding):
+    """
+    Decodes an iterable of compressed chunks (unchanged if `encoding` is empty).
+    """
+    decompressor = Decompressor(encoding)
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+
+
+def decompress(data, encoding):
+    """
+    Decodes a whole payload (unchanged if `encoding` is empty).
+    """
+    return b"".join(iter_decompressed([data], encoding))
@@ -0,0 +1,299 @@
+# Local filesystem storage backend (offline benchmarks, single-node deployments on local NVMe)
+import os
+import mmap
+import uuid
+import shutil
+import asyncio
+import tempfile
+import logging
+import mimetypes
+from collections import deque
+from datetime import datetime, timezone
+from utils.storage import Storage, UPLOAD_METRICS_WINDOW, _UploadTimer
+
+
+# Bytes per chunk yielded by `iter_chunks` and copied per write
+LOCAL_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class LocalContentSettings:
+    def __init__(self, content_type):
+        self.content_type = content_type
+        # Files are stored uncompressed
+        self.content_encoding = None
+
+
+class LocalBlobProperties:
+    """
+    Blob properties of a local file, shaped like the Azure SDK's BlobProperties.
+    """
+    def __init__(self, name, stat):
+        self.name = name
+        self.size = stat.st_size
+        # Changes whenever the file is replaced or appended to
+        self.etag = f"\"{stat.st_mtime_ns:x}-{stat.st_size:x}\""
+        self.last_modified = datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+        self.content_settings = LocalContentSettings(mimetypes.guess_type(name)[0] or "application/octet-stream")
+
+
+class LocalStorage(Storage):
+    """
+    Stores each container as a directory under `root` and each blob as a file in it (blob
+    names with "/" become subdirectories).
+
+    Writes go to a temporary file in the target directory that is renamed over the blob, so
+    readers see either the old or the new content, never a partial file. Reads are served
+    from memory maps, and `local_path` hands out the file itself, so workers use blobs in place.
+    Files are stored uncompressed (`content_encoding` is accepted and ignored), since
+    `local_path` callers read them directly.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.upload_metrics = deque(maxlen=UPLOAD_METRICS_WINDOW)
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, file_name, container_name):
+        path = os.path.normpath(os.path.join(self.root, container_name, file_name))
+        if not path.startswith(os.path.join(os.path.normpath(self.root), container_name) + os.sep):
+            raise ValueError(f"Invalid blob name '{file_name}'.")
+        return path
+
+    def blob_url(self, file_name: str, container_name: str) -> str:
+        return f"local:///{container_name}/{file_name}"
+
+    def upload_file(self, file_name: str, file_data, container_name: str, content_type="application/octet-stream",
+                    max_concurrency=None, block_size=None, content_encoding=None) -> str:
+        """
+        Writes a file atomically (temporary file + rename).
+
+        :param file_data: File stream, binary data or local file path
+        :return: URL of the stored file (local:///<container>/<name>)
+        """
+        if isinstance(file_data, (str, os.PathLike)):
+            with open(file_data, "rb") as f:
+                return self.upload_file(file_name, f, container_name, content_type, max_concurrency, block_size)
+
+        if isinstance(file_data, (bytes, bytearray)):
+            chunks = [file_data]
+        else:
+            chunks = iter(lambda: file_data.read(block_size or LOCAL_CHUNK_SIZE), b"")
+        return self.upload_stream(file_name, chunks, container_name, content_type)
+
+    def upload_stream(self, file_name: str, chunks, container_name: str, content_type="application/octet-stream",
+                      max_concurrency=None, block_size=None, content_encoding=None) -> str:
+        """
+        Writes the chunks of an iterator to a file atomically (temporary file + rename).
+        """
+        path = self._path(file_name, container_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+
+        try:
+            timer = _UploadTimer()
+            size = 0
+            with open(tmp_path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+                    timer.on_response()
+            os.replace(tmp_path, path)
+            self._record_upload(file_name, container_name, size, timer)
+            return self.blob_url(file_name, container_name)
+
+        except Exception as e:
+            logging.error(f"Upload failed for '{file_name}' in '{container_name}': {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def append_file(self, file_name: str, data, container_name: str, create=False, content_type="application/octet-stream") -> str:
+        """
+        Appends data to a file, creating it if it does not exist yet (`create` truncates it first).
+        """
+        path = self._path(file_name, container_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb" if create else "ab") as f:
+            if data:
+                f.write(data.encode("utf-8") if isinstance(data, str) else data)
+        return self.blob_url(file_name, container_name)
+
+    def download_file(self, file_name: str, container_name: str, cached=False) -> bytes:
+        """
+        Reads a whole file through a memory map.
+        """
+        path = self._path(file_name, container_name)
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return b""
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return mapped[:]
+        except FileNotFoundError:
+            message = f"Blob '{file_name}' not found in container '{container_name}'."
+            logging.error(message)
+            raise FileNotFoundError(message)
+
+    def download_to(self, file_name: str, container_name: str, destination, max_concurrency=None) -> int:
+        """
+        Copies a file to a local path (kernel-side copy) or into a writable binary file object.
+
+        :return: Number of bytes written
+        """
+        path = self._path(file_name, container_name)
+        if not os.path.exists(path):
+            message = f"Blob '{file_name}' not found in container '{container_name}'."
+            logging.error(message)
+            raise FileNotFoundError(message)
+
+        if isinstance(destination, (str, os.PathLike)):
+            shutil.copyfile(path, destination)
+            return os.path.getsize(destination)
+
+        size = 0
+        for chunk in self.iter_chunks(file_name, container_name):
+            destination.write(chunk)
+            size += len(chunk)
+        return size
+
+    def iter_chunks(self, file_name: str, container_name: str, offset=None, length=None, etag=None, decode=False):
+        """
+        Yields a byte range of a file in LOCAL_CHUNK_SIZE slices of a memory map.
+
+        :param etag: Only read the file while it still has this ETag (raises if it was replaced)
+        """
+        path = self._path(file_name, container_name)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Blob '{file_name}' not found in container '{container_name}'.")
+
+        with f:
+            properties = LocalBlobProperties(file_name, os.fstat(f.fileno()))
+            if etag and properties.etag != etag:
+                raise RuntimeError(f"Blob '{file_name}' in '{container_name}' changed since it was requested.")
+
+            start = offset or 0
+            end = properties.size if length is None else min(properties.size, start + length)
+            if end <= start:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for position in range(start, end, LOCAL_CHUNK_SIZE):
+                    yield mapped[position:min(position + LOCAL_CHUNK_SIZE, end)]
+
+    def get_properties(self, file_name: str, container_name: str):
+        try:
+            return LocalBlobProperties(file_name, os.stat(self._path(file_name, container_name)))
+        except FileNotFoundError:
+            return None
+
+    def delete_file(self, file_name: str, container_name: str) -> bool:
+        try:
+            os.remove(self._path(file_name, container_name))
+        except FileNotFoundError:
+            logging.warning(f"Blob '{file_name}' does not exist in '{container_name}'.")
+            return False
+        logging.info(f"File '{file_name}' deleted successfully from '{container_name}'.")
+        return True
+
+    def list_files(self, prefix: str, container_name: str):
+        """
+        Lists the files whose blob names start with `prefix` (only the directory of the prefix is walked).
+        """
+        container_root = os.path.join(self.root, container_name)
+        directory = os.path.join(container_root, os.path.dirname(prefix))
+        if not os.path.normpath(directory).startswith(os.path.normpath(container_root)):
+            raise ValueError(f"Invalid prefix '{prefix}'.")
+
+        files = []
+        for root, _, names in os.walk(directory):
+            for name in names:
+                file_name = os.path.relpath(os.path.join(root, name), container_root).replace(os.sep, "/")
+                if file_name.startswith(prefix) and not name.endswith(".tmp"):
+                    try:
+                        files.append(LocalBlobProperties(file_name, os.stat(os.path.join(root, name))))
+                    except FileNotFoundError:
+                        continue
+        return sorted(files, key=lambda properties: properties.name)
+
+    def delete_files(self, file_names, container_name: str) -> int:
+        deleted = 0
+        for file_name in dict.fromkeys(file_names):
+            try:
+                os.remove(self._path(file_name, container_name))
+                deleted += 1
+            except FileNotFoundError:
+                pass
+        logging.info(f"Deleted {deleted} file(s) from '{container_name}'.")
+        return deleted
+
+    def local_path(self, file_name: str, container_name: str):
+        path = self._path(file_name, container_name)
+        return path if os.path.exists(path) else None
+
+
+class AsyncLocalStorage(Storage):
+    """
+    asyncio wrapper around `LocalStorage`: file I/O runs in the default thread pool so it
+    doesn't block the event loop.
+    """
+
+    def __init__(self, root: str):
+        self._storage = LocalStorage(root)
+        self.upload_metrics = self._storage.upload_metrics
+
+    async def close(self):
+        pass
+
+    def blob_url(self, file_name, container_name):
+        return self._storage.blob_url(file_name, container_name)
+
+    async def upload_file(self, file_name, file_data, container_name, content_type="application/octet-stream",
+                          max_concurrency=None, block_size=None, content_encoding=None):
+        if hasattr(file_data, "__aiter__"):
+            return await self.upload_stream(file_name, file_data, container_name, content_type)
+        return await asyncio.to_thread(self._storage.upload_file, file_name, file_data, container_name, content_type,
+                                       max_concurrency, block_size)
+
+    async def upload_stream(self, file_name, chunks, container_name, content_type="application/octet-stream",
+                            max_concurrency=None, block_size=None, content_encoding=None):
+        """
+        Spools an async iterable of bytes to a temporary file, then stores it atomically.
+        """
+        with tempfile.SpooledTemporaryFile(max_size=LOCAL_CHUNK_SIZE) as spool:
+            async for chunk in chunks:
+                await asyncio.to_thread(spool.write, chunk)
+            spool.seek(0)
+            return await asyncio.to_thread(self._storage.upload_file, file_name, spool, container_name, content_type)
+
+    async def append_file(self, file_name, data, container_name, create=False, content_type="application/octet-stream"):
+        return await asyncio.to_thread(self._storage.append_file, file_name, data, container_name, create, content_type)
+
+    async def download_file(self, file_name, container_name, cached=False):
+        return await asyncio.to_thread(self._storage.download_file, file_name, container_name)
+
+    async def download_to(self, file_name, container_name, destination, max_concurrency=None):
+        return await asyncio.to_thread(self._storage.download_to, file_name, container_name, destination)
+
+    async def iter_chunks(self, file_name, container_name, offset=None, length=None, etag=None, decode=False):
+        chunks = self._storage.iter_chunks(file_name, container_name, offset, length, etag)
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    async def get_properties(self, file_name, container_name):
+        return await asyncio.to_thread(self._storage.get_properties, file_name, container_name)
+
+    async def generate_upload_url(self, file_name, container_name, expiry_minutes=15):
+        return self._storage.generate_upload_url(file_name, container_name, expiry_minutes)
+
+    async def delete_file(self, file_name, container_name):
+        return await asyncio.to_thread(self._storage.delete_file, file_name, container_name)
+
+    async def list_files(self, prefix, container_name):
+        return await asyncio.to_thread(self._storage.list_files, prefix, container_name)
+
+    async def delete_files(self, file_names, container_name):
+        return await asyncio.to_thread(self._storage.delete_files, list(file_names), container_name)
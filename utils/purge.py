@@ -0,0 +1,40 @@
+# Deletes audio files together with everything derived from them
+import logging
+from utils.storage import Storage
+from utils.segment_store import SegmentStore, SEGMENT_CONTAINER
+from utils.transcript_writer import partial_transcript_filename
+
+
+AUDIO_CONTAINER = "audiofiles"
+TRANSCRIPT_CONTAINER = "transcripts"
+
+
+def purge_audio_files(db, blob: Storage, audio_files):
+    """
+    Deletes audio files with their stored segments, the transcripts (final and partial) of
+    their transcription jobs, and the database rows. Blobs go in one batched delete per
+    container (see `Storage.delete_files`) rather than one request each.
+
+    :param db: PostgresManagement instance
+    :param blob: Storage backend
+    :param audio_files: `audio_files` rows to delete
+    :return: Dict with the number of audio files, jobs and blobs deleted
+    """
+    audio_ids = [audio["id"] for audio in audio_files]
+    if not audio_ids:
+        return {"audio_files": 0, "jobs": 0, "blobs": 0}
+
+    jobs = db.find_all_records("transcription_jobs", "audio_file_id = ANY(%s)", (audio_ids,))
+    audio_names = [Storage.blob_name_from_url(audio["blob_url"]) for audio in audio_files if audio.get("blob_url")]
+    transcript_names = [job["transcript_filename"] for job in jobs if job.get("transcript_filename")]
+    transcript_names += [partial_transcript_filename(job["id"]) for job in jobs]
+
+    deleted = blob.delete_files(audio_names, AUDIO_CONTAINER)
+    deleted += blob.delete_files([SegmentStore.blob_name(name) for name in audio_names], SEGMENT_CONTAINER)
+    deleted += blob.delete_files(transcript_names, TRANSCRIPT_CONTAINER)
+
+    db.delete_records("transcription_jobs", "audio_file_id = ANY(%s)", (audio_ids,))
+    db.delete_records("audio_files", "id = ANY(%s)", (audio_ids,))
+
+    logging.info(f"Purged {len(audio_ids)} audio file(s) and {len(jobs)} job(s) ({deleted} blobs).")
+    return {"audio_files": len(audio_ids), "jobs": len(jobs), "blobs": deleted}
@@ -0,0 +1,102 @@
+# Measures wall time, CPU time and memory of a block of work (e.g. one transcription stage)
+import os
+import time
+import logging
+import resource
+import threading
+import tracemalloc
+
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> int:
+    """
+    Resident set size of this process in bytes (falls back to the lifetime peak without /proc).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return peak_rss()
+
+
+def peak_rss() -> int:
+    """
+    Peak resident set size over the lifetime of this process, in bytes.
+    """
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ResourceMonitor:
+    """
+    Context manager that records the resources used by the code inside it:
+    wall and CPU seconds, peak RSS (sampled by a background thread every `sample_interval`
+    seconds) and, with `trace_python`, the peak of Python allocations from tracemalloc.
+
+    CPU time and RSS are process-wide, so the figures belong to the block only while nothing
+    else runs in the process (true for a prefork Celery worker executing one task).
+
+        with ResourceMonitor() as monitor:
+            run_stage()
+        monitor.usage  # {"wall_seconds": ..., "cpu_seconds": ..., "peak_rss_mb": ..., ...}
+    """
+    def __init__(self, sample_interval=0.5, trace_python=False):
+        self.sample_interval = sample_interval
+        self.trace_python = trace_python
+        self.usage = None
+        self._stop = threading.Event()
+        self._sampler = None
+        self._peak = 0
+
+    def __enter__(self):
+        self._started_tracing = False
+        if self.trace_python:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            tracemalloc.reset_peak()
+
+        self._start_rss = self._peak = current_rss()
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+
+        if self.sample_interval > 0:
+            self._sampler = threading.Thread(target=self._sample, name="resource-sampler", daemon=True)
+            self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._start_wall
+        cpu = time.process_time() - self._start_cpu
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+        end_rss = current_rss()
+        self._peak = max(self._peak, end_rss)
+
+        self.usage = {
+            "wall_seconds": round(wall, 3),
+            "cpu_seconds": round(cpu, 3),
+            # CPU seconds per wall second, i.e. the number of cores kept busy on average
+            "cpu_utilization": round(cpu / wall, 2) if wall > 0 else 0.0,
+            "start_rss_mb": round(self._start_rss / 2 ** 20, 1),
+            "peak_rss_mb": round(self._peak / 2 ** 20, 1),
+            "end_rss_mb": round(end_rss / 2 ** 20, 1),
+            "process_peak_rss_mb": round(peak_rss() / 2 ** 20, 1),
+            "python_peak_mb": None
+        }
+        if self.trace_python:
+            self.usage["python_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+            if self._started_tracing:
+                tracemalloc.stop()
+        return False
+
+    def _sample(self):
+        while not self._stop.wait(self.sample_interval):
+            try:
+                self._peak = max(self._peak, current_rss())
+            except Exception as e:
+                logging.warning(f"(ResourceMonitor): RSS sampling failed: {str(e)}")
+                return
@@ -0,0 +1,75 @@
+# Persists aligned ASR segments per audio file
+import json
+import logging
+from utils.storage import Storage, get_storage
+
+
+SEGMENT_CONTAINER = "segments"
+SEGMENT_FORMAT_VERSION = 1
+
+
+class SegmentStore:
+    """
+    Stores the aligned segment list (and diarization turns, once computed) of an audio file,
+    so jobs for another interval or speaker setting can be rebuilt without re-running ASR.
+
+    Segments are stored as compact JSON: `[start, end, text]` and `[start, end, speaker]` triples.
+    Each entry records the ETag of the source audio it was computed from, so a re-uploaded
+    file under the same name is not served the old file's segments.
+    """
+    def __init__(self, blob: Storage = None):
+        self.blob = blob or get_storage()
+
+    @staticmethod
+    def blob_name(audio_name: str) -> str:
+        return f"{audio_name}.segments.json"
+
+    def load(self, audio_name: str, source_etag: str = None):
+        """
+        Loads the stored segments of an audio file.
+
+        :param audio_name: Blob name of the source audio
+        :param source_etag: Current ETag of the source audio; entries computed from another version are a miss
+        :return: Dict with `duration`, `segments` and `turns` (None if never diarized), or None if nothing is stored
+        """
+        try:
+            payload = json.loads(self.blob.download_file(self.blob_name(audio_name), SEGMENT_CONTAINER))
+        except FileNotFoundError:
+            return None
+
+        if payload.get("version") != SEGMENT_FORMAT_VERSION:
+            logging.warning(f"Ignoring stored segments for '{audio_name}' with unsupported version {payload.get('version')}.")
+            return None
+        if source_etag is not None and payload.get("source_etag") != source_etag:
+            logging.info(f"Ignoring stored segments for '{audio_name}': the audio changed since they were computed.")
+            return None
+
+        turns = payload.get("turns")
+        return {
+            "duration": payload["duration"],
+            "segments": [{"start": s, "end": e, "text": t} for s, e, t in payload["segments"]],
+            "turns": [{"start": s, "end": e, "speaker": sp} for s, e, sp in turns] if turns is not None else None
+        }
+
+    def save(self, audio_name: str, duration: float, segments, turns=None, source_etag: str = None) -> str:
+        """
+        Stores the segments (and optional diarization turns) of an audio file, replacing any previous entry.
+
+        :param source_etag: ETag of the source audio the segments were computed from
+        :return: URL of the stored segment blob
+        """
+        payload = {
+            "version": SEGMENT_FORMAT_VERSION,
+            "source_etag": source_etag,
+            "duration": float(duration),
+            "segments": [
+                [float(seg.get("start", 0)), float(seg.get("end", 0)), seg.get("text", "")]
+                for seg in segments
+            ],
+            "turns": [
+                [float(turn["start"]), float(turn["end"]), str(turn["speaker"])]
+                for turn in turns
+            ] if turns is not None else None
+        }
+        data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return self.blob.upload_file(self.blob_name(audio_name), data, SEGMENT_CONTAINER, content_type="application/json")
@@ -0,0 +1,100 @@
+# Splits long recordings into shards at silence and merges the shard transcripts
+import os
+import soundfile as sf
+from utils.audio_processing import vad_segment
+
+
+SENTENCE_END = (".", "?", "!", "।", "॥")
+
+
+def find_cut_points(audio_path, shard_seconds, search_seconds=30):
+    """
+    Picks cut points roughly every `shard_seconds`, moved to the nearest VAD silence gap
+    within `search_seconds` of each target so no speech is cut mid-word.
+
+    :return: Sorted list of cut positions in samples
+    """
+    info = sf.info(audio_path)
+    sr, total = info.samplerate, info.frames
+    shard_samples, search_samples = int(shard_seconds * sr), int(search_seconds * sr)
+
+    cuts = []
+    target = shard_samples
+    # Don't leave a tail shorter than half a shard
+    while target < total - shard_samples // 2:
+        lo, hi = max(0, target - search_samples), min(total, target + search_samples)
+        window, _ = sf.read(audio_path, start=lo, stop=hi, dtype="float32", always_2d=False)
+        if window.ndim > 1:
+            window = window.mean(axis=1)
+
+        gap = nearest_silence(window, sr, target - lo)
+        cut = lo + gap if gap is not None else target
+        cuts.append(cut)
+        target = cut + shard_samples
+
+    return cuts
+
+
+def nearest_silence(window, sr, center):
+    """
+    Returns the midpoint (in samples, relative to the window) of the silence gap closest
+    to `center`, or None if the window has no gap between voiced segments.
+    """
+    voiced = vad_segment(window, sr, frame_duration_ms=30, aggressiveness=2, padding_duration_ms=300)
+    if not voiced:
+        return center
+
+    gaps = []
+    if voiced[0][0] > 0:
+        gaps.append((0, voiced[0][0]))
+    gaps.extend((prev_end, next_start) for (_, prev_end), (next_start, _) in zip(voiced, voiced[1:]) if next_start > prev_end)
+    if voiced[-1][1] < len(window):
+        gaps.append((voiced[-1][1], len(window)))
+
+    if not gaps:
+        return None
+    return min(((start + end) // 2 for start, end in gaps), key=lambda mid: abs(mid - center))
+
+
+def write_shards(audio_path, cuts, output_dir):
+    """
+    Writes one WAV file per shard.
+
+    :return: List of (shard path, offset in seconds) in chronological order
+    """
+    info = sf.info(audio_path)
+    bounds = [0] + list(cuts) + [info.frames]
+    base = os.path.splitext(os.path.basename(audio_path))[0]
+
+    shards = []
+    for idx, (start, stop) in enumerate(zip(bounds, bounds[1:])):
+        data, sr = sf.read(audio_path, start=start, stop=stop, dtype="float32")
+        shard_path = os.path.join(output_dir, f"{base}_shard{idx}.wav")
+        sf.write(shard_path, data, sr)
+        shards.append((shard_path, start / sr))
+    return shards
+
+
+def merge_shard_segments(shards, stitch_gap=0.5):
+    """
+    Offsets shard-local segment timestamps to the full recording and stitches segments that
+    were split at a shard boundary (the earlier one has no sentence end and the later one
+    starts within `stitch_gap` seconds).
+
+    :param shards: List of (offset in seconds, segments) in chronological order
+    :return: Merged list of segments
+    """
+    merged = []
+    for shard_idx, (offset, segments) in enumerate(shards):
+        for seg_idx, seg in enumerate(segments):
+            seg = {"start": seg.get("start", 0) + offset, "end": seg.get("end", 0) + offset, "text": seg.get("text", "").strip()}
+
+            if merged and shard_idx > 0 and seg_idx == 0:
+                prev = merged[-1]
+                if seg["start"] - prev["end"] <= stitch_gap and not prev["text"].endswith(SENTENCE_END):
+                    prev["end"] = seg["end"]
+                    prev["text"] = f"{prev['text']} {seg['text']}".strip()
+                    continue
+
+            merged.append(seg)
+    return merged
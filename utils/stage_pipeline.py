@@ -0,0 +1,72 @@
+# Runs work items through threaded stages connected by bounded queues
+import logging
+import queue
+import threading
+
+
+class StagePipeline:
+    """
+    Chains stages so that different items are in different stages at the same time
+    (e.g. job N+1 downloading while job N is in ASR and job N-1 is uploading).
+
+    Each stage runs in its own thread and hands items to the next stage through a bounded
+    queue, so at most `queue_size` items wait between any two stages. A stage that raises
+    for an item logs the error (and calls `on_error`) and drops that item; the other items
+    keep flowing.
+    """
+    _DONE = object()
+
+    def __init__(self, stages, queue_size=1, on_error=None):
+        """
+        :param stages: List of (name, fn) tuples; each fn takes an item and returns the item for the next stage
+        :param queue_size: Max number of items buffered between two stages
+        :param on_error: Optional callback `(item, exception)` for items dropped after a stage failure
+        """
+        if not stages:
+            raise ValueError("StagePipeline needs at least one stage.")
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.on_error = on_error
+
+    def run(self, source):
+        """
+        Feeds every item of `source` through the stages and blocks until all of them are done.
+
+        :param source: Iterable of items (may be endless, e.g. a job queue consumer)
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        threads = []
+
+        for idx, (name, fn) in enumerate(self.stages):
+            outbox = queues[idx + 1] if idx + 1 < len(queues) else None
+            thread = threading.Thread(target=self._run_stage, args=(name, fn, queues[idx], outbox),
+                                      name=f"stage-{name}", daemon=True)
+            thread.start()
+            threads.append(thread)
+
+        try:
+            for item in source:
+                queues[0].put(item)
+        finally:
+            queues[0].put(self._DONE)
+            for thread in threads:
+                thread.join()
+
+    def _run_stage(self, name, fn, inbox, outbox):
+        while True:
+            item = inbox.get()
+            if item is self._DONE:
+                if outbox is not None:
+                    outbox.put(self._DONE)
+                return
+
+            try:
+                result = fn(item)
+            except Exception as e:
+                logging.error(f"(StagePipeline): Stage '{name}' failed: {str(e)}")
+                if self.on_error is not None:
+                    self.on_error(item, e)
+                continue
+
+            if outbox is not None:
+                outbox.put(result)
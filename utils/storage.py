@@ -0,0 +1,222 @@
+# Storage interface shared by the Azure Blob and local filesystem backends
+import os
+import re
+import time
+import uuid
+import logging
+from datetime import date, datetime, timezone
+from urllib.parse import urlparse, unquote
+from dotenv import load_dotenv
+
+
+# Load environment variables
+load_dotenv()
+
+# Backend: "azure" (Azure Blob Storage) or "local" (a directory per container under STORAGE_LOCAL_ROOT)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "azure")
+STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", "/var/lib/railway/storage")
+
+# Number of recent uploads kept for `upload_stats`
+UPLOAD_METRICS_WINDOW = 200
+
+# Max blobs per batched delete request (limit of the Blob batch API)
+DELETE_BATCH_SIZE = 256
+
+
+class Storage:
+    """
+    Interface of a blob store: named files ("blobs") grouped in containers.
+
+    Missing blobs raise FileNotFoundError on download; `delete_file` returns False and
+    `get_properties` returns None for them. Properties expose `size`, `etag`, `last_modified`
+    and `content_settings.content_type` / `content_encoding`.
+
+    Uploads with a `content_encoding` ("gzip" or "zstd") may be stored compressed; `download_file`
+    and `download_to` always return the decompressed content, `iter_chunks` the stored bytes
+    unless `decode` is set.
+
+    Upload throughput and time to first byte of recent uploads are kept in `self.upload_metrics`
+    (a deque of UPLOAD_METRICS_WINDOW entries) and summarised by `upload_stats`.
+    """
+
+    @staticmethod
+    def blob_name_from_url(blob_url: str) -> str:
+        """
+        Extracts the blob name from a blob URL (as stored in `audio_files.blob_url`).
+        Plain blob names are returned unchanged.
+        """
+        if "://" not in blob_url:
+            return blob_url
+        # URL path is /<container>/<blob name>
+        path = unquote(urlparse(blob_url).path)
+        return path.lstrip("/").split("/", 1)[-1]
+
+    def blob_url(self, file_name: str, container_name: str) -> str:
+        raise NotImplementedError
+
+    def upload_file(self, file_name: str, file_data, container_name: str, content_type="application/octet-stream",
+                    max_concurrency=None, block_size=None, content_encoding=None) -> str:
+        raise NotImplementedError
+
+    def upload_stream(self, file_name: str, chunks, container_name: str, content_type="application/octet-stream",
+                      max_concurrency=None, block_size=None, content_encoding=None) -> str:
+        raise NotImplementedError
+
+    def append_file(self, file_name: str, data, container_name: str, create=False, content_type="application/octet-stream") -> str:
+        raise NotImplementedError
+
+    def download_file(self, file_name: str, container_name: str, cached=False) -> bytes:
+        raise NotImplementedError
+
+    def download_to(self, file_name: str, container_name: str, destination, max_concurrency=None) -> int:
+        raise NotImplementedError
+
+    def iter_chunks(self, file_name: str, container_name: str, offset=None, length=None, etag=None, decode=False):
+        raise NotImplementedError
+
+    def get_properties(self, file_name: str, container_name: str):
+        raise NotImplementedError
+
+    def generate_upload_url(self, file_name: str, container_name: str, expiry_minutes: int = 15) -> str:
+        raise NotImplementedError(f"{type(self).__name__} does not support direct uploads.")
+
+    def delete_file(self, file_name: str, container_name: str) -> bool:
+        raise NotImplementedError
+
+    def list_files(self, prefix: str, container_name: str):
+        """
+        Lists the blobs whose names start with `prefix` (one listing request per 5000 blobs),
+        as properties with `name`, `size`, `etag` and `last_modified`.
+        """
+        raise NotImplementedError
+
+    def delete_files(self, file_names, container_name: str) -> int:
+        """
+        Deletes many blobs of a container in as few requests as possible; missing blobs are skipped.
+
+        :return: Number of blobs deleted
+        """
+        return sum(self.delete_file(file_name, container_name) for file_name in dict.fromkeys(file_names))
+
+    def local_path(self, file_name: str, container_name: str):
+        """
+        Path of a local, read-only copy of the blob if the backend can provide one without a
+        full download (a cache hit, or the file itself on local storage); None otherwise.
+        """
+        return None
+
+    def _record_upload(self, file_name, container_name, size, timer):
+        seconds = time.perf_counter() - timer.started
+        metrics = {
+            "blob": f"{container_name}/{file_name}",
+            "bytes": size,
+            "seconds": round(seconds, 3),
+            "throughput_mbps": round(size / 2 ** 20 / seconds, 2) if size is not None and seconds > 0 else None,
+            "first_byte_seconds": round(timer.first_response - timer.started, 3) if timer.first_response else None
+        }
+        self.upload_metrics.append(metrics)
+        logging.info(f"File '{file_name}' uploaded successfully to '{container_name}' "
+                     f"({metrics['bytes']} bytes in {metrics['seconds']}s, {metrics['throughput_mbps']} MB/s, "
+                     f"first byte after {metrics['first_byte_seconds']}s).")
+
+    def upload_stats(self) -> dict:
+        """
+        Summarises the last UPLOAD_METRICS_WINDOW uploads of this instance: count, bytes,
+        mean throughput (MB/s) and mean / max time to first byte (seconds).
+        """
+        metrics = list(self.upload_metrics)
+        throughputs = [m["throughput_mbps"] for m in metrics if m["throughput_mbps"] is not None]
+        first_bytes = [m["first_byte_seconds"] for m in metrics if m["first_byte_seconds"] is not None]
+        return {
+            "uploads": len(metrics),
+            "bytes": sum(m["bytes"] or 0 for m in metrics),
+            "mean_throughput_mbps": round(sum(throughputs) / len(throughputs), 2) if throughputs else None,
+            "mean_first_byte_seconds": round(sum(first_bytes) / len(first_bytes), 3) if first_bytes else None,
+            "max_first_byte_seconds": max(first_bytes) if first_bytes else None
+        }
+
+
+def user_blob_name(user_id, filename: str, day: date = None) -> str:
+    """
+    Builds a blob name `<user_id>/<YYYY>/<MM>/<DD>/<hash>_<filename>` for a user's upload.
+
+    The random hash keeps same-named uploads from overwriting each other and spreads
+    consecutive uploads over storage partitions, while the user/date prefix keeps
+    "everything of a user (on a day)" a single prefix listing (see `user_blob_prefix`).
+
+    :param filename: Client file name (reduced to a safe base name)
+    :param day: Upload date (default: today, UTC)
+    """
+    safe_name = re.sub(r"[^A-Za-z0-9._-]+", "_", os.path.basename(filename or "")).strip("._") or "file"
+    return f"{user_blob_prefix(user_id, day or datetime.now(timezone.utc).date())}{uuid.uuid4().hex[:16]}_{safe_name}"
+
+
+def user_blob_prefix(user_id, day: date = None) -> str:
+    """
+    Name prefix of a user's blobs, or of the ones uploaded on `day`.
+    """
+    return f"{user_id}/{day:%Y/%m/%d}/" if day else f"{user_id}/"
+
+
+def original_filename(blob_name: str) -> str:
+    """
+    File name of a blob named by `user_blob_name`, without its prefix and hash.
+    """
+    base = blob_name.rsplit("/", 1)[-1]
+    hash_part, sep, filename = base.partition("_")
+    return filename if sep and len(hash_part) == 16 else base
+
+
+def get_storage() -> Storage:
+    """
+    Creates the storage backend selected by STORAGE_BACKEND.
+    """
+    if STORAGE_BACKEND == "azure":
+        from utils.azure_blob import BlobStorage
+        return BlobStorage()
+    if STORAGE_BACKEND == "local":
+        from utils.local_storage import LocalStorage
+        return LocalStorage(STORAGE_LOCAL_ROOT)
+    raise ValueError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}'. Choose 'azure' or 'local'.")
+
+
+def get_async_storage():
+    """
+    Creates the asyncio counterpart of the storage backend selected by STORAGE_BACKEND
+    (same methods as `Storage`, as coroutines).
+    """
+    if STORAGE_BACKEND == "azure":
+        from utils.azure_blob_async import AsyncBlobStorage
+        return AsyncBlobStorage()
+    if STORAGE_BACKEND == "local":
+        from utils.local_storage import AsyncLocalStorage
+        return AsyncLocalStorage(STORAGE_LOCAL_ROOT)
+    raise ValueError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}'. Choose 'azure' or 'local'.")
+
+
+class _UploadTimer:
+    """
+    Times an upload: start, and the first response of the service (the first block or the
+    single put accepted), i.e. the time to first byte.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_response = None
+
+    def on_response(self, response=None):
+        if self.first_response is None:
+            self.first_response = time.perf_counter()
+
+
+def _data_size(file_data):
+    """
+    Size in bytes of upload data, or None for non-seekable streams.
+    """
+    if isinstance(file_data, (bytes, bytearray)):
+        return len(file_data)
+    if isinstance(file_data, str):
+        return len(file_data.encode("utf-8"))
+    try:
+        return file_data.tell()
+    except (AttributeError, OSError):
+        return None
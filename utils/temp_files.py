@@ -0,0 +1,111 @@
+# Lifecycle of the worker's local temporary files (downloaded and processed audio, shards, transcripts)
+import os
+import glob
+import time
+import logging
+import threading
+
+
+# Files untouched for this many hours are swept as leftovers of crashed or lost jobs (0 disables the sweep)
+TEMP_FILE_MAX_AGE_HOURS = float(os.getenv("TEMP_FILE_MAX_AGE_HOURS", "24"))
+# Minimum seconds between two sweeps of the same process
+TEMP_FILE_SWEEP_INTERVAL = float(os.getenv("TEMP_FILE_SWEEP_INTERVAL", "900"))
+
+
+class TempFileManager:
+    """
+    Removes the local files of a job once it is done, and periodically sweeps old leftovers.
+
+    Every per-job file must be named "<job_id>_..." and live in one of `directories` (or one
+    level below); `remove_job_files` deletes them when the job completes or fails on this node.
+    Files other nodes or crashed processes left behind are removed by `sweep` once they are
+    older than `max_age` seconds. Shared files (e.g. source audio reused across jobs) are only
+    swept by age, so keep them fresh with `touch` when they are reused.
+    """
+
+    def __init__(self, directories, max_age=TEMP_FILE_MAX_AGE_HOURS * 3600, sweep_interval=TEMP_FILE_SWEEP_INTERVAL):
+        self.directories = list(directories)
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def job_files(self, job_id):
+        """
+        Local files of a job on this node.
+        """
+        paths = []
+        for directory in self.directories:
+            paths.extend(glob.glob(os.path.join(glob.escape(directory), f"{job_id}_*")))
+            paths.extend(glob.glob(os.path.join(glob.escape(directory), "*", f"{job_id}_*")))
+        return [path for path in paths if os.path.isfile(path)]
+
+    def remove_job_files(self, job_id, extra_paths=()):
+        """
+        Deletes the local files of a finished or failed job, plus `extra_paths`, then sweeps
+        leftovers if the last sweep is more than `sweep_interval` seconds ago.
+
+        :return: Number of bytes freed
+        """
+        freed = sum(_remove(path) for path in set(self.job_files(job_id)) | {p for p in extra_paths if p})
+        if freed:
+            logging.info(f"Removed local files of job {job_id} ({freed / 2 ** 20:.1f} MB).")
+        self.maybe_sweep()
+        return freed
+
+    def maybe_sweep(self):
+        if not self.max_age or time.time() - self._last_sweep < self.sweep_interval:
+            return 0
+        return self.sweep()
+
+    def sweep(self):
+        """
+        Deletes every file under `directories` not modified in the last `max_age` seconds.
+
+        :return: Number of bytes freed
+        """
+        with self._lock:
+            self._last_sweep = time.time()
+            cutoff = self._last_sweep - self.max_age
+            freed, removed = 0, 0
+            for directory in self.directories:
+                for root, _, files in os.walk(directory):
+                    for name in files:
+                        path = os.path.join(root, name)
+                        try:
+                            if os.path.getmtime(path) >= cutoff:
+                                continue
+                        except FileNotFoundError:
+                            continue
+                        size = _remove(path)
+                        freed += size
+                        removed += 1
+
+        if removed:
+            logging.info(f"Swept {removed} stale temp file(s) ({freed / 2 ** 20:.1f} MB) older than {self.max_age / 3600:.1f}h.")
+        return freed
+
+    @staticmethod
+    def touch(path):
+        """
+        Marks a reused shared file as fresh so the age sweep keeps it.
+        """
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+
+def _remove(path):
+    """
+    Deletes a file and returns its size (0 if it was already gone).
+    """
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except FileNotFoundError:
+        return 0
+    except OSError as e:
+        logging.warning(f"Could not remove temp file '{path}': {str(e)}")
+        return 0
@@ -0,0 +1,86 @@
+# Splits the node's CPU cores across co-located worker processes
+import os
+import logging
+
+
+# Thread-pool environment variables read by OpenMP, BLAS backends and numexpr
+THREAD_ENV_VARS = [
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS"
+]
+
+_budget = 0
+
+
+def available_cores() -> int:
+    """
+    Number of cores this process may run on (respects CPU affinity / container cpusets).
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def plan_threads(processes: int, cores: int = None) -> int:
+    """
+    Threads per process so that `processes` co-located processes share the cores without oversubscription.
+    """
+    cores = cores or available_cores()
+    return max(1, cores // max(1, processes))
+
+
+def apply_thread_budget(threads: int, slot: int = None) -> int:
+    """
+    Limits every thread pool of the current process (OpenMP, BLAS, torch) to `threads`.
+    Call it once per worker process, at process start.
+
+    Environment variables only affect libraries loaded afterwards, so pools that already
+    exist (e.g. numpy imported before the worker forked) are resized via threadpoolctl.
+
+    :param threads: Threads per process
+    :param slot: Optional index of this process on the node; when given, the process is
+                 pinned to its own slice of `threads` cores
+    :return: The applied budget
+    """
+    global _budget
+
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=threads)
+    except ImportError:
+        logging.warning("threadpoolctl is not installed; BLAS/OpenMP pools loaded before the budget keep their size.")
+
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Inter-op pool can only be sized before torch starts parallel work
+            pass
+    except ImportError:
+        pass
+
+    if slot is not None and hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        start = (slot * threads) % len(cores)
+        os.sched_setaffinity(0, {cores[(start + i) % len(cores)] for i in range(threads)})
+
+    _budget = threads
+    logging.info(f"Thread budget applied: {threads} thread(s) per process" + (f", pinned as slot {slot}" if slot is not None else ""))
+    return threads
+
+
+def get_thread_budget() -> int:
+    """
+    Threads per process applied by `apply_thread_budget` (0 if no budget is set).
+    """
+    return _budget
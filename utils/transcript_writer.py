@@ -0,0 +1,198 @@
+# Builds interval-based transcripts from ASR segments
+import io
+import csv
+import json
+from datetime import timedelta
+
+
+INTERVAL_SECONDS = {"1min": 60, "5min": 300}
+
+CSV_HEADER = ["Interval Start", "Interval End", "Start Time", "End Time", "Text"]
+CSV_HEADER_WITH_SPEAKER = ["Interval Start", "Interval End", "Speaker", "Start Time", "End Time", "Text"]
+
+# Transcript output formats: file extension and content type
+TRANSCRIPT_FORMATS = {
+    "csv": (".csv", "text/csv"),
+    "jsonl": (".jsonl", "application/x-ndjson"),
+    "parquet": (".parquet", "application/vnd.apache.parquet")
+}
+
+# Rows per Parquet record batch
+PARQUET_BATCH_ROWS = 10000
+
+
+def partial_transcript_filename(job_id):
+    return f"{job_id}_transcript.partial.csv"
+
+
+def transcript_filename(job_id, transcript_format="csv"):
+    return f"{job_id}_transcript{TRANSCRIPT_FORMATS[transcript_format][0]}"
+
+
+def iter_interval_records(segments, audio_duration, interval_seconds, include_speaker=False, turns=None,
+                          first_interval=0, last_interval=None):
+    """
+    Re-buckets transcript segments into fixed-length intervals.
+    Yields one record per (interval, overlapping segment) with numeric timestamps:
+    `interval_index`, `interval_start`, `interval_end`, `speaker` (None without speakers),
+    `start`, `end` and `text`.
+
+    :param segments: List of dicts with `start`, `end` and `text`
+    :param audio_duration: Length of the audio in seconds
+    :param interval_seconds: Interval length in seconds
+    :param include_speaker: Whether records carry a speaker
+    :param turns: Optional list of diarization turns (dicts with `start`, `end`, `speaker`)
+    :param first_interval: Index of the first interval to emit
+    :param last_interval: Index after the last interval to emit (default: through the end of the audio)
+    """
+    num_intervals = int(audio_duration / interval_seconds) + 1
+    if last_interval is not None:
+        num_intervals = min(num_intervals, last_interval)
+    for i in range(first_interval, num_intervals):
+        t_start, t_end = i * interval_seconds, (i + 1) * interval_seconds
+        seen = set()
+
+        for seg in segments:
+            seg_start, seg_end, text = seg.get("start", 0), seg.get("end", 0), seg.get("text", "").strip()
+
+            if max(t_start, seg_start) < min(t_end, seg_end):  # Overlapping transcript segment
+                speaker = None
+
+                if include_speaker:
+                    speaker = "Unknown"
+                    for turn in turns or []:
+                        d_start, d_end, detected_speaker = turn["start"], turn["end"], turn["speaker"].replace("#", "Person")
+                        if max(seg_start, d_start) < min(seg_end, d_end) and (detected_speaker, int(seg_start), int(seg_end), text) not in seen:
+                            seen.add((detected_speaker, int(seg_start), int(seg_end), text))
+                            speaker = detected_speaker
+                            break
+
+                yield {
+                    "interval_index": i,
+                    "interval_start": t_start,
+                    "interval_end": t_end,
+                    "speaker": speaker,
+                    "start": seg_start,
+                    "end": seg_end,
+                    "text": text
+                }
+
+
+def build_interval_rows(segments, audio_duration, interval_seconds, include_speaker=False, turns=None,
+                        first_interval=0, last_interval=None):
+    """
+    Yields the records of `iter_interval_records` as rows in the transcript CSV layout.
+    """
+    interval_labels = {}
+    for record in iter_interval_records(segments, audio_duration, interval_seconds, include_speaker, turns,
+                                        first_interval, last_interval):
+        # Interval labels are shared by every row of the interval, so format them once
+        labels = interval_labels.get(record["interval_index"])
+        if labels is None:
+            labels = interval_labels[record["interval_index"]] = (
+                str(timedelta(seconds=record["interval_start"])),
+                str(timedelta(seconds=record["interval_end"]))
+            )
+
+        row = [
+            labels[0],
+            labels[1],
+            str(timedelta(seconds=int(record["start"]))),
+            str(timedelta(seconds=int(record["end"]))),
+            record["text"]
+        ]
+        if include_speaker:
+            row.insert(2, record["speaker"])
+        yield row
+
+
+def rows_to_csv(rows, header=None) -> str:
+    """
+    Formats rows (and an optional header) as CSV text, e.g. to append to a partial transcript.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def write_interval_csv(path, segments, audio_duration, interval, include_speaker=False, turns=None):
+    """
+    Writes the interval-based transcript CSV for the given segments.
+
+    :param path: Local path of the CSV file to write
+    :param interval: Interval key ('1min' or '5min')
+    :return: Path of the written CSV file
+    """
+    interval_seconds = INTERVAL_SECONDS[interval]
+
+    with open(path, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(CSV_HEADER_WITH_SPEAKER if include_speaker else CSV_HEADER)
+        writer.writerows(build_interval_rows(segments, audio_duration, interval_seconds, include_speaker, turns))
+
+    return path
+
+
+def write_interval_jsonl(path, segments, audio_duration, interval, include_speaker=False, turns=None):
+    """
+    Writes the interval-based transcript as JSON lines, one record per line.
+    """
+    interval_seconds = INTERVAL_SECONDS[interval]
+
+    with open(path, "w", encoding="utf-8") as jsonl_file:
+        for record in iter_interval_records(segments, audio_duration, interval_seconds, include_speaker, turns):
+            jsonl_file.write(json.dumps(record, ensure_ascii=False))
+            jsonl_file.write("\n")
+
+    return path
+
+
+def write_interval_parquet(path, segments, audio_duration, interval, include_speaker=False, turns=None):
+    """
+    Writes the interval-based transcript as Parquet, streaming record batches of
+    PARQUET_BATCH_ROWS rows so the whole table is never held in memory.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    interval_seconds = INTERVAL_SECONDS[interval]
+    schema = pa.schema([
+        ("interval_index", pa.int32()),
+        ("interval_start", pa.float64()),
+        ("interval_end", pa.float64()),
+        ("speaker", pa.string()),
+        ("start", pa.float64()),
+        ("end", pa.float64()),
+        ("text", pa.string())
+    ])
+
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        batch = []
+        for record in iter_interval_records(segments, audio_duration, interval_seconds, include_speaker, turns):
+            batch.append(record)
+            if len(batch) >= PARQUET_BATCH_ROWS:
+                writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+                batch = []
+        if batch:
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+
+    return path
+
+
+TRANSCRIPT_WRITERS = {
+    "csv": write_interval_csv,
+    "jsonl": write_interval_jsonl,
+    "parquet": write_interval_parquet
+}
+
+
+def write_transcript(path, transcript_format, segments, audio_duration, interval, include_speaker=False, turns=None):
+    """
+    Writes the interval-based transcript in the requested format ('csv', 'jsonl' or 'parquet').
+    """
+    if transcript_format not in TRANSCRIPT_WRITERS:
+        raise ValueError(f"Invalid transcript format '{transcript_format}'. Choose one of {sorted(TRANSCRIPT_WRITERS)}.")
+    return TRANSCRIPT_WRITERS[transcript_format](path, segments, audio_duration, interval, include_speaker, turns)